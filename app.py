@@ -1,11 +1,31 @@
-from flask import Flask, request, render_template
-import numpy as np
-import pandas as pd
+import time
 
-from pipeline.predict_pipeline import PredictPipeline, CustomData
+from flask import Flask, request, render_template, jsonify, g
 
+from src.logger import setup_logging
+from pipeline.predict_pipeline import PredictPipeline, CustomData, get_micro_batcher
+from src.components.prediction_cache import get_prediction_cache
+from src.metrics import counter, histogram, render_metrics, CONTENT_TYPE
+
+setup_logging()
 app = Flask(__name__)
 
+REQUEST_SECONDS = histogram('http_request_seconds', 'Request latency by endpoint', ['endpoint', 'method'])
+REQUESTS = counter('http_requests_total', 'Requests by endpoint and status code', ['endpoint', 'method', 'status'])
+
+@app.before_request
+def start_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def record_request(response):
+    start = g.pop('request_start', None)
+    endpoint = request.endpoint or 'unmatched'
+    if start is not None:
+        REQUEST_SECONDS.observe(time.perf_counter() - start, endpoint=endpoint, method=request.method)
+    REQUESTS.inc(endpoint=endpoint, method=request.method, status=response.status_code)
+    return response
+
 @app.route('/')
 def index():
     return render_template('index.html')
@@ -28,17 +48,48 @@ def predict():
             exam_difficulty = request.form.get('exam_difficulty')
 
             data = CustomData(id, age, gender, course, study_hours, class_attendance, internet_access, sleep_hours, sleep_quality, study_method, facility_rating, exam_difficulty)
-            data_df = data.get_data_as_dataframe()
-
-            predict_pipeline = PredictPipeline()
-            results = predict_pipeline.predict(data_df)
+            results = get_micro_batcher().predict(data.to_dict())
 
-            return render_template('index.html', results=results[0])
+            return render_template('index.html', results=results)
         
         except Exception as e:
             return f"An error occurred: {e}"
 
     return render_template('index.html')
 
+@app.route('/api/predict', methods=['POST'])
+def api_predict():
+    payload = request.get_json(silent=True)
+    if isinstance(payload, dict):
+        payload = [payload]
+    if not isinstance(payload, list) or len(payload) == 0:
+        return jsonify(error="Expected a JSON object or a non-empty array of records"), 400
+
+    try:
+        records = [CustomData.from_dict(record).to_dict() for record in payload]
+    except (AttributeError, ValueError) as e:
+        return jsonify(error=str(e)), 400
+
+    try:
+        if len(records) == 1:
+            # Single records from concurrent clients are coalesced into one
+            # vectorized transform/predict call by the micro-batcher.
+            preds = [get_micro_batcher().predict(records[0])]
+        else:
+            preds = PredictPipeline().predict_records(records)
+
+        return jsonify(predictions=[float(pred) for pred in preds])
+
+    except Exception as e:
+        return jsonify(error=f"An error occurred: {e}"), 500
+
+@app.route('/api/cache/stats', methods=['GET'])
+def cache_stats():
+    return jsonify(get_prediction_cache().stats())
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    return render_metrics(), 200, {'Content-Type': CONTENT_TYPE}
+
 if __name__ == '__main__':
     app.run(host='0.0.0.0', debug=False)
\ No newline at end of file
@@ -0,0 +1,202 @@
+'''
+Asynchronous serving entry point (plain ASGI, no framework needed):
+
+    uvicorn asgi:app --host 0.0.0.0 --port 8000
+
+Predictions run on the bounded PredictionService pool instead of the request
+thread. Once the pool and its queue are saturated, requests are rejected at
+once with 429/503 instead of piling up until they time out. /healthz and
+/readyz report the queue depth so the load balancer can shed traffic early.
+'''
+import json
+import time
+import logging
+import asyncio
+from urllib.parse import parse_qs
+
+from src.logger import setup_logging
+from pipeline.predict_pipeline import CustomData, PredictPipeline, warm_up
+from src.components.prediction_cache import get_prediction_cache
+from src.components.prediction_service import PredictionService, ServiceOverloaded
+from src.metrics import counter, histogram, render_metrics, CONTENT_TYPE
+
+setup_logging()
+
+MAX_BODY_BYTES = 1 << 20
+
+REQUEST_SECONDS = histogram('http_request_seconds', 'Request latency by endpoint', ['endpoint', 'method'])
+REQUESTS = counter('http_requests_total', 'Requests by endpoint and status code', ['endpoint', 'method', 'status'])
+
+
+def predict_records(records):
+    return PredictPipeline().predict_records(records)
+
+
+service = PredictionService(predict_records, warm_up_fn=warm_up)
+_start_lock = asyncio.Lock()
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+async def _ensure_started():
+    # Servers without lifespan support start the service on the first request.
+    if not service.started:
+        async with _start_lock:
+            if not service.started:
+                await service.start()
+
+
+async def _read_body(receive):
+    chunks, size, more_body = [], 0, True
+    while more_body:
+        message = await receive()
+        chunk = message.get('body', b'')
+        size += len(chunk)
+        if size > MAX_BODY_BYTES:
+            raise HTTPError(413, "Request body too large")
+        chunks.append(chunk)
+        more_body = message.get('more_body', False)
+    return b''.join(chunks)
+
+
+async def _respond(send, status, body, content_type='application/json', headers=()):
+    if isinstance(body, str):
+        body = body.encode()
+    elif not isinstance(body, bytes):
+        body = json.dumps(body).encode()
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', content_type.encode()), (b'content-length', str(len(body)).encode()),
+                    *headers],
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+def _deadline_ms(scope):
+    for name, value in scope.get('headers', []):
+        if name == b'x-request-deadline-ms':
+            try:
+                return max(0.0, float(value))
+            except ValueError:
+                raise HTTPError(400, "X-Request-Deadline-Ms must be a number of milliseconds")
+    return None
+
+
+def _render_index(**context):
+    # Flask is only needed for the HTML form, not for the JSON API.
+    from flask import render_template
+    from app import app as flask_app
+
+    with flask_app.test_request_context():
+        return render_template('index.html', **context)
+
+
+async def index(scope, receive):
+    return 200, _render_index(), 'text/html; charset=utf-8'
+
+
+async def predict_form(scope, receive):
+    form = {key: values[0] for key, values in parse_qs((await _read_body(receive)).decode()).items()}
+    try:
+        record = CustomData.from_dict({**form, 'id': 0}).to_dict()
+    except ValueError as e:
+        return 400, f"An error occurred: {e}", 'text/plain; charset=utf-8'
+
+    preds = await service.predict([record], deadline_ms=_deadline_ms(scope))
+    return 200, _render_index(results=preds[0]), 'text/html; charset=utf-8'
+
+
+async def api_predict(scope, receive):
+    try:
+        payload = json.loads(await _read_body(receive) or b'null')
+    except ValueError:
+        payload = None
+    if isinstance(payload, dict):
+        payload = [payload]
+    if not isinstance(payload, list) or len(payload) == 0:
+        return 400, {'error': "Expected a JSON object or a non-empty array of records"}, 'application/json'
+
+    try:
+        records = [CustomData.from_dict(record).to_dict() for record in payload]
+    except (AttributeError, ValueError) as e:
+        return 400, {'error': str(e)}, 'application/json'
+
+    preds = await service.predict(records, deadline_ms=_deadline_ms(scope))
+    return 200, {'predictions': preds}, 'application/json'
+
+
+async def healthz(scope, receive):
+    return 200, {'status': 'ok', **service.stats()}, 'application/json'
+
+
+async def readyz(scope, receive):
+    stats = service.stats()
+    return (200 if stats['ready'] else 503), stats, 'application/json'
+
+
+async def metrics(scope, receive):
+    return 200, render_metrics(), CONTENT_TYPE
+
+
+async def cache_stats(scope, receive):
+    return 200, get_prediction_cache().stats(), 'application/json'
+
+
+ROUTES = {
+    ('GET', '/'): index,
+    ('POST', '/predict'): predict_form,
+    ('POST', '/api/predict'): api_predict,
+    ('GET', '/healthz'): healthz,
+    ('GET', '/readyz'): readyz,
+    ('GET', '/metrics'): metrics,
+    ('GET', '/api/cache/stats'): cache_stats,
+}
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await _ensure_started()
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await service.stop()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        return await _lifespan(receive, send)
+    if scope['type'] != 'http':
+        return
+
+    start = time.perf_counter()
+    method, path = scope['method'], scope['path']
+    handler = ROUTES.get((method, path))
+    endpoint = handler.__name__ if handler is not None else 'unmatched'
+    headers = ()
+
+    try:
+        if handler is None:
+            raise HTTPError(404, "Not found")
+        await _ensure_started()
+        status, body, content_type = await handler(scope, receive)
+
+    except HTTPError as e:
+        status, body, content_type = e.status, {'error': str(e)}, 'application/json'
+    except ServiceOverloaded as e:
+        status, body, content_type = e.status, {'error': str(e), **service.stats()}, 'application/json'
+        headers = ((b'retry-after', str(e.retry_after).encode()),)
+    except Exception as e:
+        logging.error(f"Error occured in the async prediction service: {e}")
+        status, body, content_type = 500, {'error': f"An error occurred: {e}"}, 'application/json'
+
+    await _respond(send, status, body, content_type, headers)
+    REQUEST_SECONDS.observe(time.perf_counter() - start, endpoint=endpoint, method=method)
+    REQUESTS.inc(endpoint=endpoint, method=method, status=status)
@@ -0,0 +1,343 @@
+'''
+Benchmarks the inference and training hot paths on synthetic records.
+
+    python -m benchmarks.run --scales 2000 20000
+    python -m benchmarks.run --update-baseline      # store the current numbers
+    python -m benchmarks.run                        # exits 1 on a regression
+
+Every scale runs in its own temporary working directory with the cpu
+hardware profile, so nothing under artifacts/ is touched and no GPU or
+network access is needed.
+'''
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import subprocess
+import platform
+import tempfile
+from datetime import datetime
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+import yaml
+
+from src.logger import setup_logging
+from src.utils import track_peak_memory
+from src.components.data_ingestion import DataIngestion
+from src.components.data_transformation import DataTransformation, CustomFeatureAdder
+from src.components.hardware_profile import load_hardware_profile
+from src.components.model_trainer import ModelTrainer
+from src.components.model_registry import ModelRegistry
+from pipeline.predict_pipeline import PredictPipeline
+from benchmarks.synthetic import make_frame, make_records
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+@dataclass
+class BenchmarkConfig:
+    scales: tuple = (2_000, 20_000)
+    # Model served by the latency/throughput benchmarks when it was trained.
+    serving_model: str = "XGBRegressor"
+    models: tuple = ()
+    latency_requests: int = 500
+    warmup_requests: int = 20
+    batch_size: int = 10_000
+    repeats: int = 3
+    seed: int = 42
+    output_path: str = os.path.join('artifacts', 'benchmarks', 'latest.json')
+    baseline_path: str = os.path.join('benchmarks', 'baseline.json')
+    # Relative slowdown (or throughput drop) tolerated before a metric counts as a regression.
+    tolerance: float = 0.25
+    # Serving entry points whose cold import cost is measured in a fresh interpreter.
+    import_modules: tuple = ('app', 'asgi', 'pipeline.predict_pipeline')
+    extra_meta: dict = field(default_factory=dict)
+
+
+def _timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+def _latency_stats(prefix, samples):
+    samples = np.asarray(samples) * 1000.0
+    return {
+        f"{prefix}_p50_ms": float(np.percentile(samples, 50)),
+        f"{prefix}_p99_ms": float(np.percentile(samples, 99)),
+    }
+
+
+# ru_maxrss survives exec() on Linux, so the child reads its own VmHWM.
+IMPORT_PROBE = '''
+import sys, time
+start = time.perf_counter()
+__import__(sys.argv[1])
+seconds = time.perf_counter() - start
+with open('/proc/self/status') as file_obj:
+    peak_kb = next(int(line.split()[1]) for line in file_obj if line.startswith('VmHWM:'))
+print(seconds, peak_kb / 1024.0)
+'''
+
+
+def higher_is_better(metric):
+    return metric.endswith('_per_sec') or metric.startswith('r2.')
+
+
+class BenchmarkSuite:
+    def __init__(self, config=None):
+        self.benchmark_config = config or BenchmarkConfig()
+
+    def _prepare_workdir(self, workdir, frame):
+        os.makedirs(os.path.join(workdir, 'notebook', 'data'))
+        frame.to_csv(os.path.join(workdir, 'notebook', 'data', 'data.csv'), index=False)
+
+        with open(os.path.join(REPO_ROOT, 'config', 'training.yaml')) as file_obj:
+            training_config = yaml.safe_load(file_obj) or {}
+        training_config.setdefault('hardware', {})['profile'] = 'cpu'
+        os.makedirs(os.path.join(workdir, 'config'))
+        with open(os.path.join(workdir, 'config', 'training.yaml'), 'w') as file_obj:
+            yaml.safe_dump(training_config, file_obj)
+        shutil.copy(os.path.join(REPO_ROOT, 'config', 'params.yaml'), os.path.join(workdir, 'config', 'params.yaml'))
+        return training_config
+
+    def bench_training(self, training_config):
+        results = {}
+
+        with track_peak_memory("Benchmark ingestion") as memory:
+            seconds, (train_path, test_path) = _timed(DataIngestion().initiate_data_ingestion)
+        results['ingestion_seconds'] = seconds
+        results['ingestion_peak_mb'] = memory['peak_rss_mb']
+
+        with track_peak_memory("Benchmark transformation") as memory:
+            seconds, (X_train, y_train, X_test, y_test, preprocessor_path) = _timed(
+                lambda: DataTransformation().initiate_data_transformation(train_path, test_path))
+        results['transformation_seconds'] = seconds
+        results['transformation_peak_mb'] = memory['peak_rss_mb']
+
+        profile = load_hardware_profile(training_config.get('hardware', {}))
+        models = ModelTrainer().build_models(profile)
+        if self.benchmark_config.models:
+            models = {name: model for name, model in models.items() if name in self.benchmark_config.models}
+
+        fitted = {}
+        for name, model in models.items():
+            with track_peak_memory(f"Benchmark fit {name}") as memory:
+                seconds, _ = _timed(lambda: model.fit(X_train, y_train))
+            predict_seconds, preds = _timed(lambda: model.predict(X_test))
+            y_true = np.asarray(y_test, dtype=np.float64)
+            r2 = 1.0 - np.sum((y_true - preds) ** 2) / np.sum((y_true - y_true.mean()) ** 2)
+
+            results[f"train_seconds.{name}"] = seconds
+            results[f"train_peak_mb.{name}"] = memory['peak_rss_mb']
+            results[f"predict_rows_per_sec.{name}"] = len(y_true) / predict_seconds
+            results[f"r2.{name}"] = float(r2)
+            fitted[name] = model
+
+        serving_name = self.benchmark_config.serving_model
+        serving_name = serving_name if serving_name in fitted else next(iter(fitted))
+        ModelTrainer().save_model(fitted[serving_name], preprocessor_path, sample=X_test,
+                                  compile_config=training_config.get('compiled_model', {}))
+        return results
+
+    def bench_load(self):
+        samples = []
+        for _ in range(self.benchmark_config.repeats):
+            registry = ModelRegistry()
+            seconds, _ = _timed(registry.get)
+            samples.append(seconds)
+        return {'artifact_load_ms': float(np.median(samples) * 1000.0)}
+
+    def bench_feature_adder(self, frame):
+        numeric = frame[['id', 'age', 'study_hours', 'class_attendance', 'sleep_hours']].astype(np.float64)
+        adder = CustomFeatureAdder().fit(numeric)
+        seconds = min(_timed(lambda: adder.transform(numeric))[0] for _ in range(self.benchmark_config.repeats))
+        return {'feature_adder_rows_per_sec': len(numeric) / seconds}
+
+    def bench_serving(self, frame):
+        config = self.benchmark_config
+        predict_pipeline = PredictPipeline()
+        predict_pipeline.registry = ModelRegistry()
+        loaded = predict_pipeline.registry.get()
+
+        records = make_records(config.warmup_requests + config.latency_requests, seed=config.seed + 1)
+        for record in records[:config.warmup_requests]:
+            predict_pipeline.predict_records([record], log_inputs=False, use_cache=False)
+
+        results = {}
+        samples = []
+        for record in records[config.warmup_requests:]:
+            seconds, _ = _timed(lambda: predict_pipeline.predict_records([record], log_inputs=False, use_cache=False))
+            samples.append(seconds)
+        results.update(_latency_stats('single_record', samples))
+
+        # The plain sklearn path, for comparison with the compiled kernel.
+        samples = []
+        for record in records[config.warmup_requests:]:
+            features = pd.DataFrame([record])[PredictPipeline.cols_order]
+            seconds, _ = _timed(lambda: loaded.model.predict(loaded.preprocessor.transform(features)))
+            samples.append(seconds)
+        results.update(_latency_stats('single_record_sklearn', samples))
+
+        # The library's own predict on the compiled preprocessor's output.
+        if loaded.compiled_preprocessor is not None:
+            samples = []
+            for record in records[config.warmup_requests:]:
+                features = loaded.compiled_preprocessor.transform_records([record], dtype=loaded.input_dtype)
+                seconds, _ = _timed(lambda: loaded.model.predict(features))
+                samples.append(seconds)
+            results.update(_latency_stats('single_record_native_model', samples))
+
+        batch = frame.drop(columns=['exam_score']).head(config.batch_size)
+        with track_peak_memory("Benchmark batch predict") as memory:
+            seconds = min(_timed(lambda: predict_pipeline.predict(batch, log_inputs=False, use_cache=False))[0]
+                          for _ in range(config.repeats))
+        results['batch_rows_per_sec'] = len(batch) / seconds
+        results['batch_peak_mb'] = memory['peak_rss_mb']
+        return results
+
+    def bench_imports(self):
+        '''
+        Cold import time and peak RSS of each serving entry point, i.e. what
+        a worker pays before it can load artifacts.
+        '''
+        env = {**os.environ, 'PYTHONPATH': os.pathsep.join(filter(None, [REPO_ROOT, os.environ.get('PYTHONPATH')]))}
+        results = {}
+        workdir = tempfile.mkdtemp(prefix="bench_imports_")
+        try:
+            for module in self.benchmark_config.import_modules:
+                samples = []
+                for _ in range(self.benchmark_config.repeats):
+                    output = subprocess.run([sys.executable, '-c', IMPORT_PROBE, module], cwd=workdir, env=env,
+                                            check=True, capture_output=True, text=True).stdout
+                    samples.append([float(value) for value in output.split()])
+                seconds, peak_mb = np.min(samples, axis=0)
+                results[f"import_seconds.{module}"] = float(seconds)
+                results[f"import_peak_mb.{module}"] = float(peak_mb)
+            return results
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    def run_scale(self, n_rows):
+        frame = make_frame(n_rows, seed=self.benchmark_config.seed)
+        cwd = os.getcwd()
+        workdir = tempfile.mkdtemp(prefix=f"bench_{n_rows}_")
+        try:
+            training_config = self._prepare_workdir(workdir, frame)
+            os.chdir(workdir)
+            results = self.bench_training(training_config)
+            results.update(self.bench_load())
+            results.update(self.bench_feature_adder(frame))
+            results.update(self.bench_serving(frame))
+            return results
+        finally:
+            os.chdir(cwd)
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    def environment(self):
+        import sklearn
+        import xgboost
+        import catboost
+
+        return {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+            'sklearn': sklearn.__version__,
+            'xgboost': xgboost.__version__,
+            'catboost': catboost.__version__,
+            **self.benchmark_config.extra_meta,
+        }
+
+    def run(self):
+        print("Benchmarking serving imports ...", flush=True)
+        results = {'imports': self.bench_imports()}
+        for n_rows in self.benchmark_config.scales:
+            print(f"Benchmarking {n_rows} rows ...", flush=True)
+            results[str(n_rows)] = self.run_scale(n_rows)
+        return {'meta': self.environment(), 'results': results}
+
+
+def compare_results(current, baseline, tolerance):
+    '''
+    Returns one line per metric that got worse than the baseline by more
+    than `tolerance` (relative), in the direction that metric is judged.
+    '''
+    regressions = []
+    for scale, metrics in baseline.get('results', {}).items():
+        for metric, base in metrics.items():
+            value = current['results'].get(scale, {}).get(metric)
+            if value is None or not base:
+                continue
+            change = (value - base) / abs(base)
+            worse = change < -tolerance if higher_is_better(metric) else change > tolerance
+            if worse:
+                regressions.append(f"{_label(scale)} {metric}: {base:.4g} -> {value:.4g} ({change:+.0%})")
+    return regressions
+
+
+def _label(scale):
+    return f"{scale} rows" if scale.isdigit() else scale
+
+
+def write_json(data, file_path):
+    os.makedirs(os.path.dirname(file_path) or '.', exist_ok=True)
+    with open(file_path, 'w') as file_obj:
+        json.dump(data, file_obj, indent=2, sort_keys=True)
+
+
+def main(argv=None):
+    defaults = BenchmarkConfig()
+    parser = argparse.ArgumentParser(description="Benchmark inference and training on synthetic student records.")
+    parser.add_argument("--scales", type=int, nargs='+', default=list(defaults.scales), help="dataset sizes in rows")
+    parser.add_argument("--models", nargs='+', default=[], help="only train these models (names as in the trainer)")
+    parser.add_argument("--latency-requests", type=int, default=defaults.latency_requests)
+    parser.add_argument("--output", default=defaults.output_path, help="where to write the results JSON")
+    parser.add_argument("--baseline", default=defaults.baseline_path, help="results JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=defaults.tolerance)
+    parser.add_argument("--update-baseline", action="store_true", help="store these results as the new baseline")
+    args = parser.parse_args(argv)
+    setup_logging()
+
+    config = BenchmarkConfig(scales=tuple(args.scales), models=tuple(args.models),
+                             latency_requests=args.latency_requests, output_path=args.output,
+                             baseline_path=args.baseline, tolerance=args.tolerance)
+    current = BenchmarkSuite(config).run()
+    write_json(current, config.output_path)
+    print(f"Results written to {config.output_path}")
+
+    for scale, metrics in current['results'].items():
+        print(f"\n{_label(scale)}")
+        for metric, value in sorted(metrics.items()):
+            print(f"  {metric:45s} {value:12.4f}")
+
+    if args.update_baseline:
+        write_json(current, config.baseline_path)
+        print(f"\nBaseline updated at {config.baseline_path}")
+        return 0
+
+    if not os.path.isfile(config.baseline_path):
+        print(f"\nNo baseline at {config.baseline_path}; run with --update-baseline to create one")
+        return 0
+
+    with open(config.baseline_path) as file_obj:
+        baseline = json.load(file_obj)
+    regressions = compare_results(current, baseline, config.tolerance)
+    if regressions:
+        print(f"\n{len(regressions)} regressions against {config.baseline_path}:")
+        for line in regressions:
+            print(f"  {line}")
+        return 1
+
+    print(f"\nNo regressions against {config.baseline_path} (tolerance {config.tolerance:.0%})")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,53 @@
+import numpy as np
+import pandas as pd
+
+# Same choices as the form in templates/index.html.
+CATEGORIES = {
+    'gender': ['male', 'female', 'other'],
+    'course': ['b.sc', 'diploma', 'bca', 'b.com', 'ba', 'bba', 'b.tech'],
+    'internet_access': ['no', 'yes'],
+    'sleep_quality': ['average', 'poor', 'good'],
+    'study_method': ['online videos', 'self-study', 'coaching', 'group study', 'mixed'],
+    'facility_rating': ['low', 'medium', 'high'],
+    'exam_difficulty': ['easy', 'moderate', 'hard'],
+}
+
+
+def make_frame(n_rows, seed=42, missing_rate=0.0):
+    '''
+    Synthetic student records in the CustomData schema plus an exam_score
+    that depends on the features, so trained models have signal to fit.
+    Numbers are rounded to the precision users type into the form.
+    '''
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        'id': np.arange(n_rows),
+        'age': rng.integers(17, 25, n_rows),
+        'gender': rng.choice(CATEGORIES['gender'], n_rows),
+        'course': rng.choice(CATEGORIES['course'], n_rows),
+        'study_hours': rng.uniform(0, 8, n_rows).round(2),
+        'class_attendance': rng.uniform(40, 100, n_rows).round(1),
+        'internet_access': rng.choice(CATEGORIES['internet_access'], n_rows),
+        'sleep_hours': rng.uniform(4, 10, n_rows).round(1),
+        'sleep_quality': rng.choice(CATEGORIES['sleep_quality'], n_rows),
+        'study_method': rng.choice(CATEGORIES['study_method'], n_rows),
+        'facility_rating': rng.choice(CATEGORIES['facility_rating'], n_rows),
+        'exam_difficulty': rng.choice(CATEGORIES['exam_difficulty'], n_rows),
+    })
+
+    score = (20 + 5.0 * df['study_hours'] + 0.25 * df['class_attendance'] + 1.5 * df['sleep_hours']
+             + 5.0 * (df['sleep_quality'] == 'good') - 5.0 * (df['sleep_quality'] == 'poor')
+             + 3.0 * (df['study_method'] == 'coaching') - 6.0 * (df['exam_difficulty'] == 'hard')
+             + 2.0 * (df['internet_access'] == 'yes') + rng.normal(0, 5, n_rows))
+    df['exam_score'] = score.clip(0, 100).round(1)
+
+    if missing_rate > 0:
+        for column in ('study_hours', 'class_attendance', 'sleep_hours'):
+            df.loc[rng.random(n_rows) < missing_rate, column] = np.nan
+
+    return df
+
+
+def make_records(n_records, seed=42):
+    df = make_frame(n_records, seed=seed).drop(columns=['exam_score'])
+    return df.to_dict(orient='records')
@@ -0,0 +1,25 @@
+import os
+import multiprocessing
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+# Threads let the micro-batcher coalesce concurrent requests inside a worker.
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+timeout = 60
+graceful_timeout = 30
+
+# Import wsgi.py (libraries and artifacts, no predictions) once in the master
+# and fork the workers from it.
+preload_app = True
+
+
+def post_fork(server, worker):
+    # Native thread pools and the batching thread do not survive fork();
+    # rebuild them with one prediction before this worker takes requests.
+    from pipeline.predict_pipeline import warm_up
+
+    try:
+        warm_up(use_micro_batcher=True)
+    except Exception as e:
+        server.log.error(f"Worker {worker.pid} warm-up failed: {e}")
@@ -0,0 +1,108 @@
+import logging
+from src.logger import setup_logging
+from src.exception import CustomException
+
+import os
+import sys
+import argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+
+import pandas as pd
+from threadpoolctl import threadpool_limits
+
+from pipeline.predict_pipeline import PredictPipeline
+from src.components.model_registry import get_model_registry
+
+@dataclass
+class BulkPredictConfig:
+    chunksize: int = 50_000
+    n_workers: int = os.cpu_count() or 1
+    # Model threads per worker process. The default of one thread per
+    # process keeps n_workers processes from oversubscribing the cores.
+    threads_per_worker: int = 1
+    # Chunks allowed in flight per worker; bounds memory regardless of file size.
+    prefetch_per_worker: int = 2
+
+
+def _init_worker(n_threads):
+    # Caps the OpenMP/BLAS pools (HGB, linear models) for the whole process;
+    # XGBoost and CatBoost are capped by the registry when it loads them.
+    threadpool_limits(limits=n_threads)
+    registry = get_model_registry()
+    registry.registry_config.predict_threads = n_threads
+    registry.get()
+
+
+def _predict_chunk(chunk):
+    preds = PredictPipeline().predict(chunk, log_inputs=False, use_cache=False)
+    return chunk['id'].to_numpy(), preds
+
+
+def _write_chunk(file_obj, result):
+    ids, preds = result
+    pd.DataFrame({'id': ids, 'exam_score': preds}).to_csv(file_obj, header=False, index=False)
+
+
+class BulkPredictor:
+    def __init__(self, config=None):
+        self.bulk_predict_config = config or BulkPredictConfig()
+
+    def initiate_bulk_predict(self, input_path, output_path):
+        try:
+            config = self.bulk_predict_config
+            max_in_flight = max(1, config.n_workers * config.prefetch_per_worker)
+            logging.info(f"Bulk scoring {input_path} in chunks of {config.chunksize} on {config.n_workers} workers "
+                         f"with {config.threads_per_worker} threads each")
+
+            n_rows = 0
+            pending = deque()
+            os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+
+            with ProcessPoolExecutor(max_workers=config.n_workers, initializer=_init_worker,
+                                     initargs=(config.threads_per_worker,)) as executor, \
+                    open(output_path, 'w', newline='') as file_obj:
+                file_obj.write('id,exam_score\n')
+
+                for chunk in pd.read_csv(input_path, chunksize=config.chunksize):
+                    # Futures are drained oldest first, so output keeps input order.
+                    if len(pending) >= max_in_flight:
+                        n_rows += self._drain_one(pending, file_obj)
+                    pending.append(executor.submit(_predict_chunk, chunk))
+
+                while pending:
+                    n_rows += self._drain_one(pending, file_obj)
+
+            logging.info(f"Bulk scoring completed, {n_rows} rows written to {output_path}")
+            return n_rows
+
+        except Exception as e:
+            logging.error(f"Error occured at bulk predict stage: {e}")
+            raise CustomException(e, sys)
+
+    @staticmethod
+    def _drain_one(pending, file_obj):
+        result = pending.popleft().result()
+        _write_chunk(file_obj, result)
+        return len(result[0])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score a CSV of student records into an id,exam_score submission file.")
+    parser.add_argument("input_path")
+    parser.add_argument("-o", "--output", default=os.path.join("artifacts", "submission.csv"))
+    parser.add_argument("--chunksize", type=int, default=BulkPredictConfig.chunksize)
+    parser.add_argument("--workers", type=int, default=BulkPredictConfig.n_workers)
+    parser.add_argument("--threads-per-worker", type=int, default=BulkPredictConfig.threads_per_worker)
+    args = parser.parse_args(argv)
+    setup_logging()
+
+    config = BulkPredictConfig(chunksize=args.chunksize, n_workers=args.workers,
+                               threads_per_worker=args.threads_per_worker)
+    n_rows = BulkPredictor(config).initiate_bulk_predict(args.input_path, args.output)
+    print(f"{n_rows} predictions written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
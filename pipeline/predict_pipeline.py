@@ -1,46 +1,133 @@
-from src.logger import logging
+import logging
 from src.exception import CustomException
 import traceback
-import os
 import sys
 
-from src.utils import load_object, save_user_input
-import pandas as pd
+from src.components.audit_log import get_audit_log
+from src.components.model_registry import get_model_registry
+from src.components.artifact_store import LazyArtifact
+from src.components.micro_batcher import MicroBatcher
+from src.components.prediction_cache import get_prediction_cache
+from src.metrics import counter, histogram
+import numpy as np
+
+PREDICT_STAGE_SECONDS = histogram('predict_stage_seconds', 'Time spent in each stage of a prediction call', ['stage'])
+PREDICT_ROWS = counter('predict_rows_total', 'Rows predicted, by where the prediction came from', ['source'])
+PREDICT_ERRORS = counter('predict_errors_total', 'Prediction calls that raised')
 
 class PredictPipeline:
+    cols_order = ['id', 'age', 'gender', 'course', 'study_hours',
+                  'class_attendance', 'internet_access', 'sleep_hours',
+                  'sleep_quality', 'study_method', 'facility_rating', 'exam_difficulty']
+
     def __init__(self):
-        pass
+        self.registry = get_model_registry()
 
-    def predict(self, data):
-        try:
-            preprocessor_path = os.path.join("artifacts", "preprocessor.pkl")
-            model_path = os.path.join("artifacts", "model.pkl")
+    def _predict_frame(self, loaded, features):
+        with PREDICT_STAGE_SECONDS.time(stage='transform'):
+            if loaded.compiled_preprocessor is not None:
+                data_scaled = loaded.compiled_preprocessor.transform(features, dtype=loaded.input_dtype)
+            else:
+                data_scaled = loaded.preprocessor.transform(features)
+
+        with PREDICT_STAGE_SECONDS.time(stage='model_predict'):
+            preds = loaded.predict(data_scaled)
+        PREDICT_ROWS.inc(len(features), source='model')
+        return preds
+
+    def _cached_predict(self, loaded, records, compute):
+        '''
+        Serves what it can from the prediction cache and calls
+        compute(missing_row_indices) for the rest.
+        '''
+        cache = get_prediction_cache()
+        with PREDICT_STAGE_SECONDS.time(stage='cache_lookup'):
+            keys, values = cache.lookup(loaded.version, records)
+        missing = [i for i, value in enumerate(values) if value is None]
+        PREDICT_ROWS.inc(len(records) - len(missing), source='cache')
+
+        if missing:
+            computed = compute(missing)
+            cache.store(loaded.version, [keys[i] for i in missing], computed)
+            for i, pred in zip(missing, computed):
+                values[i] = pred
 
-            preprocessor = load_object(preprocessor_path)
-            model = load_object(model_path)
+        return np.asarray(values, dtype=np.float64)
+
+    def _log_inputs(self, rows):
+        with PREDICT_STAGE_SECONDS.time(stage='audit_log'):
+            get_audit_log().log_records(rows)
+
+    def predict(self, data, log_inputs=True, use_cache=True):
+        # pandas is only needed for DataFrame input, not on the record path.
+        import pandas as pd
+
+        try:
+            with PREDICT_STAGE_SECONDS.time(stage='registry'):
+                loaded = self.registry.get()
 
             features = pd.DataFrame(data)
-            cols_order = ['id', 'age', 'gender', 'course', 'study_hours', 
-                      'class_attendance', 'internet_access', 'sleep_hours', 
-                      'sleep_quality', 'study_method', 'facility_rating', 'exam_difficulty']
-            features = features[cols_order]
+            features = features[self.cols_order]
+
+            if use_cache:
+                preds = self._cached_predict(loaded, features.to_dict(orient='records'),
+                                             lambda rows: self._predict_frame(loaded, features.iloc[rows]))
+            else:
+                preds = self._predict_frame(loaded, features)
 
-            data_scaled = preprocessor.transform(features)
+            if log_inputs:
+                tmp = features.copy()
 
-            preds = model.predict(data_scaled)
+                tmp['exam_score'] = preds
+                self._log_inputs(tmp.to_dict(orient='records'))
+            return preds
+
+        except Exception as e:
+            PREDICT_ERRORS.inc()
+            logging.error(traceback.format_exc())
+            logging.error(f"Error occured in prediction pipeline: {e}")
+            raise CustomException(e, sys)
+
+    def predict_records(self, records, log_inputs=True, use_cache=True):
+        '''
+        Predicts a list of record dicts. Uses the compiled preprocessor when
+        available, so no DataFrame is built on the request path.
+        '''
+        with PREDICT_STAGE_SECONDS.time(stage='registry'):
+            loaded = self.registry.get()
+        if loaded.compiled_preprocessor is None:
+            import pandas as pd
+
+            return self.predict(pd.DataFrame.from_records(records), log_inputs=log_inputs, use_cache=use_cache)
+
+        def compute(rows):
+            with PREDICT_STAGE_SECONDS.time(stage='transform'):
+                data_scaled = loaded.compiled_preprocessor.transform_records([records[i] for i in rows],
+                                                                             dtype=loaded.input_dtype)
+            with PREDICT_STAGE_SECONDS.time(stage='model_predict'):
+                preds = loaded.predict(data_scaled)
+            PREDICT_ROWS.inc(len(data_scaled), source='model')
+            return preds
 
-            tmp = features.copy()
+        try:
+            if use_cache:
+                preds = self._cached_predict(loaded, records, compute)
+            else:
+                preds = compute(range(len(records)))
 
-            tmp['exam_score'] = preds
-            features_dict = tmp.to_dict(orient='records')[0]
-            save_user_input(features_dict)
+            if log_inputs:
+                self._log_inputs([
+                    {**{column: record.get(column) for column in self.cols_order}, 'exam_score': float(pred)}
+                    for record, pred in zip(records, preds)
+                ])
             return preds
 
         except Exception as e:
+            PREDICT_ERRORS.inc()
             logging.error(traceback.format_exc())
             logging.error(f"Error occured in prediction pipeline: {e}")
             raise CustomException(e, sys)
-        
+
 class CustomData:
     def __init__(self,
                  id: int,
@@ -68,7 +155,46 @@ class CustomData:
         self.facility_rating = facility_rating
         self.exam_difficulty = exam_difficulty
 
+    @classmethod
+    def from_dict(cls, record):
+        try:
+            return cls(
+                id=int(record.get('id', 0)),
+                age=int(record['age']),
+                gender=str(record['gender']),
+                course=str(record['course']),
+                study_hours=float(record['study_hours']),
+                class_attendance=float(record['class_attendance']),
+                internet_access=str(record['internet_access']),
+                sleep_hours=float(record['sleep_hours']),
+                sleep_quality=str(record['sleep_quality']),
+                study_method=str(record['study_method']),
+                facility_rating=str(record['facility_rating']),
+                exam_difficulty=str(record['exam_difficulty']),
+            )
+
+        except (KeyError, TypeError, ValueError) as e:
+            raise ValueError(f"Invalid prediction record {record!r}: {e}")
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "age": self.age,
+            "gender": self.gender,
+            "course": self.course,
+            "study_hours": self.study_hours,
+            "class_attendance": self.class_attendance,
+            "internet_access": self.internet_access,
+            "sleep_hours": self.sleep_hours,
+            "sleep_quality": self.sleep_quality,
+            "study_method": self.study_method,
+            "facility_rating": self.facility_rating,
+            "exam_difficulty": self.exam_difficulty,
+        }
+
     def get_data_as_dataframe(self):
+        import pandas as pd
+
         try:
             custom_data_input_dict = {
                 "id": [self.id],
@@ -91,4 +217,68 @@ class CustomData:
 
         except Exception as e:
             logging.error(f"Error occured in get_data_as_dataframe: {e}")
-            raise CustomException(e, sys)
\ No newline at end of file
+            raise CustomException(e, sys)
+
+def predict_records(records):
+    return PredictPipeline().predict_records([CustomData.from_dict(record).to_dict() for record in records])
+
+
+_micro_batcher = MicroBatcher(predict_records)
+
+def get_micro_batcher():
+    return _micro_batcher
+
+
+# A valid form submission used to exercise the prediction path before traffic.
+WARMUP_RECORD = {
+    'id': 0, 'age': 20, 'gender': 'male', 'course': 'b.sc', 'study_hours': 4.0, 'class_attendance': 80.0,
+    'internet_access': 'yes', 'sleep_hours': 7.0, 'sleep_quality': 'average', 'study_method': 'self-study',
+    'facility_rating': 'medium', 'exam_difficulty': 'moderate',
+}
+
+def preload():
+    '''
+    Imports the libraries and loads every artifact, the lazy fallbacks
+    included, without predicting. The gunicorn master runs this before
+    forking: OpenMP pools (XGBoost, HistGradientBoosting) started in the
+    parent are not fork-safe, so predictions are left to each worker.
+    '''
+    # Imported here so forked workers inherit it for the DataFrame fallback.
+    import pandas  # noqa: F401
+
+    try:
+        loaded = PredictPipeline().registry.get()
+        for artifact in (loaded.preprocessor, loaded.model):
+            if isinstance(artifact, LazyArtifact):
+                artifact.load()
+        logging.info(f"Serving artifacts preloaded with model version {loaded.version}")
+        return loaded.version
+
+    except Exception as e:
+        logging.error(f"Error occured while preloading the serving artifacts: {e}")
+        raise CustomException(e, sys)
+
+
+def warm_up(use_micro_batcher=False):
+    '''
+    Loads the artifacts and runs one prediction through the served path and
+    the sklearn/native model fallbacks, so lazy imports, unpickling and
+    native thread pools are initialized before the first request. Nothing
+    is cached or logged.
+    '''
+    import pandas as pd
+
+    try:
+        pipeline = PredictPipeline()
+        loaded = pipeline.registry.get()
+        pipeline.predict_records([WARMUP_RECORD], log_inputs=False, use_cache=False)
+        features = loaded.preprocessor.transform(pd.DataFrame([WARMUP_RECORD])[PredictPipeline.cols_order])
+        loaded.model.predict(np.asarray(features, dtype=loaded.input_dtype))
+        if use_micro_batcher:
+            get_micro_batcher().start()
+        logging.info(f"Prediction path warmed up with model version {loaded.version}")
+        return loaded.version
+
+    except Exception as e:
+        logging.error(f"Error occured while warming up the prediction path: {e}")
+        raise CustomException(e, sys)
@@ -0,0 +1,188 @@
+import logging
+from src.logger import setup_logging
+from src.exception import CustomException
+
+import os
+import sys
+import argparse
+
+import yaml
+
+from src.components.data_ingestion import DataIngestion, DataIngestionConfig
+from src.components.data_transformation import DataTransformation, DataTransformationConfig
+from src.components.model_trainer import ModelTrainer
+from src.components.artifact_store import ArtifactStore
+from src.components.hardware_profile import detect_hardware
+from src.components.incremental_trainer import IncrementalTrainer, IncrementalTrainerConfig
+from src.components.stage_runner import StageRunner, code_digest, config_digest, file_digest
+from src.utils import load_array
+from src.metrics import REGISTRY
+
+class TrainPipeline:
+    '''
+    Runs ingestion -> transformation -> model training, skipping every stage
+    whose inputs hash to the same key as its last successful run.
+    '''
+    # Stage timings in Prometheus text format, for a node exporter textfile collector.
+    metrics_path = os.path.join('artifacts', 'training_metrics.prom')
+    def __init__(self, force=False, out_of_core=None):
+        with open("config/training.yaml", "r") as file:
+            self.training_config = yaml.safe_load(file) or {}
+
+        self.data_config = self.training_config.get('data', {}) or {}
+        self.out_of_core_config = self.training_config.get('out_of_core', {}) or {}
+        low_memory = self.data_config.get('low_memory', False)
+        self.out_of_core = self.data_config.get('out_of_core', False) if out_of_core is None else out_of_core
+
+        self.runner = StageRunner(force=force)
+        self.data_ingestion = DataIngestion(DataIngestionConfig(
+            low_memory=low_memory,
+            chunk_size=self.out_of_core_config.get('chunk_size', DataIngestionConfig.chunk_size),
+        ))
+        self.data_transformation = DataTransformation(DataTransformationConfig(
+            low_memory=low_memory,
+            chunk_size=self.data_config.get('transform_chunk_size', DataTransformationConfig.chunk_size),
+        ))
+        self.model_trainer = ModelTrainer()
+
+    def run_data_ingestion(self):
+        config = self.data_ingestion.ingestion_config
+        if self.out_of_core:
+            # The streaming split never holds the whole dataset, so no raw copy is written.
+            fn, outputs = self.data_ingestion.initiate_streaming_ingestion, [config.train_data_path, config.test_data_path]
+        else:
+            fn, outputs = self.data_ingestion.initiate_data_ingestion, [config.raw_data_path, config.train_data_path, config.test_data_path]
+
+        self.runner.run(
+            'data_ingestion',
+            fn,
+            inputs={
+                'data': file_digest(config.source_data_path),
+                'config': config_digest(self.data_config),
+                'out_of_core': config_digest(self.out_of_core_config) if self.out_of_core else None,
+                'code': code_digest('src.components.data_ingestion', 'src.utils'),
+            },
+            outputs=outputs,
+        )
+        return config.train_data_path, config.test_data_path
+
+    def run_data_transformation(self, train_path, test_path):
+        config = self.data_transformation.data_transformation_config
+        if self.out_of_core:
+            fn = self.data_transformation.initiate_streaming_transformation
+        else:
+            fn = self.data_transformation.initiate_data_transformation
+
+        self.runner.run(
+            'data_transformation',
+            lambda: fn(train_path, test_path),
+            inputs={
+                'train': self.runner.output_digest('data_ingestion', train_path),
+                'test': self.runner.output_digest('data_ingestion', test_path),
+                'config': config_digest(self.data_config),
+                'out_of_core': self.out_of_core,
+                'code': code_digest('src.components.data_transformation', 'src.components.features',
+                                    'src.components.compiled_preprocessor', 'src.utils', 'src.serving_utils'),
+            },
+            outputs=self.transformation_outputs(),
+        )
+        return (
+            load_array(config.X_train_file_path),
+            load_array(config.y_train_file_path),
+            load_array(config.X_test_file_path),
+            load_array(config.y_test_file_path),
+            config.preprocessor_obj_file_path,
+        )
+
+    def transformation_outputs(self):
+        config = self.data_transformation.data_transformation_config
+        return [config.preprocessor_obj_file_path, config.X_train_file_path, config.y_train_file_path,
+                config.X_test_file_path, config.y_test_file_path]
+
+    def run_model_trainer(self, X_train, y_train, X_test, y_test, preprocessor_path):
+        training_config = self.training_config
+
+        with open("config/params.yaml", "r") as file:
+            all_params = yaml.safe_load(file)
+
+        hardware_config = training_config.get('hardware', {})
+        if hardware_config.get('profile', 'auto') == 'auto':
+            hardware_config = {**hardware_config, 'detected': detect_hardware()}
+
+        if self.out_of_core:
+            fn = self.model_trainer.initiate_streaming_model_trainer
+        else:
+            fn = self.model_trainer.initiate_model_trainer
+
+        result = self.runner.run(
+            'model_trainer',
+            lambda: fn(X_train, y_train, X_test, y_test, preprocessor_path),
+            inputs={
+                'data': [self.runner.output_digest('data_transformation', path) for path in self.transformation_outputs()],
+                'params': config_digest(all_params),
+                'out_of_core': config_digest(self.out_of_core_config) if self.out_of_core else None,
+                'scheduler': config_digest(training_config.get('scheduler', {})),
+                'hardware': config_digest(hardware_config),
+                'compiled_model': config_digest(training_config.get('compiled_model', {})),
+                'code': code_digest('src.components.model_trainer', 'src.components.training_scheduler',
+                                    'src.components.trial_cache', 'src.components.search_data',
+                                    'src.components.hardware_profile', 'src.components.artifact_store',
+                                    'src.components.compiled_ensemble',
+                                    'src.utils', 'src.serving_utils'),
+            },
+            outputs=[self.model_trainer.model_trainer_config.trained_model_file_path, ArtifactStore().current_path],
+        )
+        return result
+
+    def run(self):
+        try:
+            train_path, test_path = self.run_data_ingestion()
+            X_train, y_train, X_test, y_test, preprocessor_path = self.run_data_transformation(train_path, test_path)
+            result = self.run_model_trainer(X_train, y_train, X_test, y_test, preprocessor_path)
+            logging.info(f"Training pipeline completed: {result}")
+            REGISTRY.write(self.metrics_path)
+            return result
+
+        except Exception as e:
+            logging.error(f"Error occured in training pipeline: {e}")
+            raise CustomException(e, sys)
+
+    def run_incremental(self, paths):
+        '''
+        Folds new labelled rows into the served model instead of retraining
+        from scratch; a later full run rebuilds everything from the source data.
+        '''
+        try:
+            config = IncrementalTrainerConfig(**(self.training_config.get('incremental', {}) or {}))
+            trainer = IncrementalTrainer(config, low_memory=self.data_config.get('low_memory', False))
+            result = trainer.initiate_incremental_training(paths, self.training_config.get('compiled_model', {}))
+            logging.info(f"Incremental training completed: {result}")
+            REGISTRY.write(self.metrics_path)
+            return result
+
+        except Exception as e:
+            logging.error(f"Error occured in incremental training pipeline: {e}")
+            raise CustomException(e, sys)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the training pipeline, skipping stages whose inputs did not change.")
+    parser.add_argument("--force", action="store_true", help="rerun every stage even if it is up to date")
+    parser.add_argument("--out-of-core", action="store_true", default=None,
+                        help="stream the data in chunks and train XGBoost with external memory")
+    parser.add_argument("--incremental", nargs='+', metavar="PATH",
+                        help="fold these CSV/Parquet files of labelled rows into the current model instead")
+    args = parser.parse_args(argv)
+    setup_logging()
+
+    pipeline = TrainPipeline(force=args.force, out_of_core=args.out_of_core)
+    if args.incremental:
+        print(f"Incremental update: {pipeline.run_incremental(args.incremental)}")
+        return
+
+    result = pipeline.run()
+    print(f"Best model: {result}")
+
+
+if __name__ == '__main__':
+    main()
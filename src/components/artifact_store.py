@@ -0,0 +1,349 @@
+import logging
+from src.logger import setup_logging
+from src.exception import CustomException
+
+import os
+import sys
+import copy
+import json
+import shutil
+import hashlib
+import argparse
+import platform
+import importlib
+import importlib.metadata
+import threading
+from datetime import datetime
+from dataclasses import dataclass
+
+import numpy as np
+
+from src.serving_utils import save_object, load_object, file_sha256
+from src.components.compiled_preprocessor import CompiledPreprocessor
+from src.components.compiled_ensemble import CompiledEnsemble
+
+FORMAT_VERSION = 1
+
+@dataclass
+class ArtifactStoreConfig:
+    root_dir: str = os.path.join('artifacts', 'model_store')
+    # Older published versions kept next to the current one for rollback.
+    keep_versions: int = 2
+    verify_checksums: bool = True
+
+
+# Import name -> distribution name, read from package metadata so checking
+# a manifest does not import libraries the serving path loads lazily.
+DISTRIBUTIONS = {'sklearn': 'scikit-learn', 'xgboost': 'xgboost', 'catboost': 'catboost', 'dill': 'dill'}
+
+
+def library_versions():
+    versions = {'python': platform.python_version(), 'numpy': np.__version__}
+    for name, distribution in DISTRIBUTIONS.items():
+        try:
+            versions[name] = importlib.metadata.version(distribution)
+        except importlib.metadata.PackageNotFoundError:
+            continue
+    return versions
+
+
+def _class_path(obj):
+    return f"{type(obj).__module__}.{type(obj).__qualname__}"
+
+
+def _import_class(class_path):
+    module_name, _, class_name = class_path.rpartition('.')
+    return getattr(importlib.import_module(module_name), class_name)
+
+
+def _json_safe(value):
+    try:
+        json.dumps(value)
+        return True
+    except TypeError:
+        return False
+
+
+def _save_model(model, version_dir):
+    '''
+    Native formats where the library has one: XGBoost UBJSON, CatBoost
+    .cbm, and raw coefficient arrays for sklearn linear models. Anything
+    else is pickled.
+    '''
+    library = type(model).__module__.split('.')[0]
+    entry = {'class': _class_path(model), 'library': library}
+
+    if library == 'xgboost':
+        model.save_model(os.path.join(version_dir, 'model.ubj'))
+        return {**entry, 'kind': 'xgboost_ubj', 'files': {'model': 'model.ubj'}}
+
+    if library == 'catboost':
+        model.save_model(os.path.join(version_dir, 'model.cbm'), format='cbm')
+        return {**entry, 'kind': 'catboost_cbm', 'files': {'model': 'model.cbm'}}
+
+    params = model.get_params() if hasattr(model, 'get_params') else None
+    if type(model).__module__.startswith('sklearn.linear_model') and hasattr(model, 'coef_') and _json_safe(params):
+        np.save(os.path.join(version_dir, 'coef.npy'), np.asarray(model.coef_))
+        np.save(os.path.join(version_dir, 'intercept.npy'), np.asarray(model.intercept_))
+        return {**entry, 'kind': 'linear_npy', 'params': params,
+                'files': {'coef': 'coef.npy', 'intercept': 'intercept.npy'}}
+
+    save_object(os.path.join(version_dir, 'model.pkl'), model)
+    return {**entry, 'kind': 'pickle', 'files': {'model': 'model.pkl'}}
+
+
+def _save_arrays(compiled, prefix, version_dir):
+    meta, arrays = compiled.to_arrays()
+    files = {}
+    for name, array in arrays.items():
+        files[name] = f"{prefix}_{name}.npy"
+        np.save(os.path.join(version_dir, files[name]), np.ascontiguousarray(array))
+    return {'kind': 'npy', 'meta': meta, 'files': files}
+
+
+def _load_arrays(compiled_class, entry, version_dir):
+    arrays = {name: np.load(os.path.join(version_dir, file_name), mmap_mode='r')
+              for name, file_name in entry['files'].items()}
+    return compiled_class.from_arrays(entry['meta'], arrays)
+
+
+def _load_model(entry, version_dir):
+    files = {name: os.path.join(version_dir, file_name) for name, file_name in entry['files'].items()}
+    kind = entry['kind']
+
+    if kind == 'pickle':
+        return load_object(files['model'])
+
+    model_class = _import_class(entry['class'])
+    if kind == 'xgboost_ubj':
+        model = model_class()
+        model.load_model(files['model'])
+        return model
+
+    if kind == 'catboost_cbm':
+        model = model_class()
+        model.load_model(files['model'], format='cbm')
+        return model
+
+    if kind == 'linear_npy':
+        model = model_class(**entry['params'])
+        # Read-only mappings share the page cache between worker processes.
+        model.coef_ = np.load(files['coef'], mmap_mode='r')
+        intercept = np.load(files['intercept'])
+        model.intercept_ = intercept[()] if intercept.ndim == 0 else intercept
+        model.n_features_in_ = model.coef_.shape[-1]
+        return model
+
+    raise ValueError(f"Unknown model artifact kind '{kind}'")
+
+
+def _loaded_artifact(obj):
+    return obj
+
+
+class LazyArtifact:
+    '''
+    Stands in for an artifact and loads it on first attribute access, e.g.
+    the sklearn preprocessor or the native model that are only fallbacks
+    when the compiled versions are available.
+    '''
+    def __init__(self, file_path, loader=load_object):
+        self._file_path = file_path
+        self._loader = loader
+        self._obj = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        if self._obj is None:
+            with self._lock:
+                if self._obj is None:
+                    self._obj = self._loader(self._file_path)
+        return self._obj
+
+    def __getattr__(self, name):
+        # Private names are never forwarded: copy and pickle look them up on
+        # instances whose __init__ has not run, where load() would recurse.
+        if name.startswith('_'):
+            raise AttributeError(f"{type(self).__name__} has no attribute '{name}'")
+        return getattr(self.load(), name)
+
+    # Copies and pickles are of the loaded artifact, not of the wrapper.
+    def __reduce__(self):
+        return _loaded_artifact, (self.load(),)
+
+    def __copy__(self):
+        return copy.copy(self.load())
+
+    def __deepcopy__(self, memo):
+        return copy.deepcopy(self.load(), memo)
+
+
+class ArtifactStore:
+    '''
+    Versioned directories of serving artifacts under root_dir, each with a
+    manifest.json listing the files, their checksums and the library
+    versions that wrote them. CURRENT names the version to serve and is
+    swapped atomically on publish.
+    '''
+    def __init__(self, config=None):
+        self.store_config = config or ArtifactStoreConfig()
+
+    @property
+    def current_path(self):
+        return os.path.join(self.store_config.root_dir, 'CURRENT')
+
+    def version_dir(self, version):
+        return os.path.join(self.store_config.root_dir, version)
+
+    def manifest_path(self, version):
+        return os.path.join(self.version_dir(version), 'manifest.json')
+
+    def current_version(self):
+        try:
+            with open(self.current_path) as file_obj:
+                return file_obj.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def read_manifest(self, version):
+        with open(self.manifest_path(version)) as file_obj:
+            return json.load(file_obj)
+
+    def publish(self, model, preprocessor_path, compiled_preprocessor=None, compiled_model=None):
+        root_dir = self.store_config.root_dir
+        tmp_dir = os.path.join(root_dir, f".tmp.{os.getpid()}")
+        try:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            os.makedirs(tmp_dir)
+
+            model_entry = _save_model(model, tmp_dir)
+            shutil.copyfile(preprocessor_path, os.path.join(tmp_dir, 'preprocessor.pkl'))
+
+            compiled_entry = None
+            if compiled_preprocessor is not None:
+                compiled_entry = _save_arrays(compiled_preprocessor, 'compiled', tmp_dir)
+            compiled_model_entry = None
+            if compiled_model is not None:
+                compiled_model_entry = _save_arrays(compiled_model, 'compiled_model', tmp_dir)
+
+            checksums = {name: file_sha256(os.path.join(tmp_dir, name)) for name in sorted(os.listdir(tmp_dir))}
+            version = hashlib.sha256(json.dumps(checksums, sort_keys=True).encode()).hexdigest()[:16]
+
+            manifest = {
+                'format_version': FORMAT_VERSION,
+                'version': version,
+                'created_at': datetime.now().isoformat(timespec='seconds'),
+                'libraries': library_versions(),
+                'model': model_entry,
+                'preprocessor': {'kind': 'pickle', 'files': {'preprocessor': 'preprocessor.pkl'}},
+                'compiled_preprocessor': compiled_entry,
+                'compiled_model': compiled_model_entry,
+                'checksums': checksums,
+            }
+            with open(os.path.join(tmp_dir, 'manifest.json'), 'w') as file_obj:
+                json.dump(manifest, file_obj, indent=2)
+
+            # Same content hashes to the same version, which is already in place.
+            if os.path.isdir(self.version_dir(version)):
+                shutil.rmtree(tmp_dir)
+            else:
+                os.replace(tmp_dir, self.version_dir(version))
+
+            tmp_current = f"{self.current_path}.tmp.{os.getpid()}"
+            with open(tmp_current, 'w') as file_obj:
+                file_obj.write(version)
+            os.replace(tmp_current, self.current_path)
+
+            self._prune(version)
+            logging.info(f"Published artifact store version {version} ({model_entry['kind']} model)")
+            return version
+
+        except Exception as e:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            logging.error(f"Error occured at artifact store publish stage: {e}")
+            raise CustomException(e, sys)
+
+    def _prune(self, current):
+        root_dir = self.store_config.root_dir
+        versions = [name for name in os.listdir(root_dir)
+                    if name != current and not name.startswith('.') and os.path.isdir(os.path.join(root_dir, name))]
+        versions.sort(key=lambda name: os.path.getmtime(os.path.join(root_dir, name)), reverse=True)
+        for name in versions[self.store_config.keep_versions:]:
+            shutil.rmtree(os.path.join(root_dir, name), ignore_errors=True)
+
+    def _check_manifest(self, manifest, version_dir):
+        if manifest.get('format_version') != FORMAT_VERSION:
+            raise ValueError(f"Unsupported artifact store format {manifest.get('format_version')}")
+
+        if self.store_config.verify_checksums:
+            for name, checksum in manifest['checksums'].items():
+                if file_sha256(os.path.join(version_dir, name)) != checksum:
+                    raise ValueError(f"Checksum mismatch for {name} in {version_dir}")
+
+        installed = library_versions()
+        for name, written in manifest.get('libraries', {}).items():
+            if name in installed and installed[name] != written:
+                logging.warning(f"Artifacts were written with {name} {written}, running {installed[name]}")
+
+    def load(self, version=None):
+        '''
+        Returns (model, preprocessor, compiled_preprocessor, compiled_model,
+        manifest) for `version`, default the current one. The preprocessor
+        and model are LazyArtifacts when compiled versions make them
+        fallbacks.
+        '''
+        try:
+            version = version or self.current_version()
+            if version is None:
+                raise FileNotFoundError(f"No published artifacts under {self.store_config.root_dir}")
+
+            version_dir = self.version_dir(version)
+            manifest = self.read_manifest(version)
+            self._check_manifest(manifest, version_dir)
+
+            compiled_model = None
+            if manifest.get('compiled_model') is not None:
+                compiled_model = _load_arrays(CompiledEnsemble, manifest['compiled_model'], version_dir)
+                model = LazyArtifact(version_dir, loader=lambda path: _load_model(manifest['model'], path))
+            else:
+                model = _load_model(manifest['model'], version_dir)
+
+            compiled_preprocessor = None
+            if manifest.get('compiled_preprocessor') is not None:
+                compiled_preprocessor = _load_arrays(CompiledPreprocessor, manifest['compiled_preprocessor'],
+                                                     version_dir)
+
+            preprocessor_path = os.path.join(version_dir, manifest['preprocessor']['files']['preprocessor'])
+            if compiled_preprocessor is not None:
+                preprocessor = LazyArtifact(preprocessor_path)
+            else:
+                preprocessor = load_object(preprocessor_path)
+
+            return model, preprocessor, compiled_preprocessor, compiled_model, manifest
+
+        except Exception as e:
+            logging.error(f"Error occured at artifact store load stage: {e}")
+            raise CustomException(e, sys)
+
+
+def main(argv=None):
+    '''
+    Publishes existing pickled artifacts into the store, e.g. after
+    upgrading from a tree that only wrote model.pkl/preprocessor.pkl.
+    '''
+    parser = argparse.ArgumentParser(description="Publish pickled artifacts into the native artifact store.")
+    parser.add_argument("--model", default=os.path.join('artifacts', 'model.pkl'))
+    parser.add_argument("--preprocessor", default=os.path.join('artifacts', 'preprocessor.pkl'))
+    parser.add_argument("--compiled-preprocessor", default=os.path.join('artifacts', 'preprocessor_compiled.npz'))
+    args = parser.parse_args(argv)
+    setup_logging()
+
+    compiled = None
+    if os.path.isfile(args.compiled_preprocessor):
+        compiled = CompiledPreprocessor.load(args.compiled_preprocessor)
+    version = ArtifactStore().publish(load_object(args.model), args.preprocessor, compiled)
+    print(f"Published version {version}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,218 @@
+import logging
+from src.exception import CustomException
+
+import os
+import sys
+import csv
+import json
+import time
+import queue
+import atexit
+import threading
+import itertools
+from datetime import datetime
+from dataclasses import dataclass
+
+@dataclass
+class AuditLogConfig:
+    log_dir: str = 'artifacts'
+    file_prefix: str = 'user_input_logs'
+    # 'csv' or 'parquet'; parquet needs pyarrow and falls back to csv without it.
+    file_format: str = 'csv'
+    max_queue_size: int = 10_000
+    # Seconds a request waits for room on a full queue. After that its
+    # records are appended to a spill file instead, so none are lost.
+    put_timeout: float = 0.05
+    flush_batch_size: int = 256
+    flush_interval: float = 1.0
+    max_file_bytes: int = 64 * 1024 * 1024
+
+
+class _CsvSink:
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.file_obj = open(file_path, 'a', newline='')
+        self.writer = None
+
+    def write(self, rows):
+        if self.writer is None:
+            self.writer = csv.DictWriter(self.file_obj, fieldnames=list(rows[0].keys()), extrasaction='ignore')
+            if self.file_obj.tell() == 0:
+                self.writer.writeheader()
+        self.writer.writerows(rows)
+        self.file_obj.flush()
+
+    def size(self):
+        return self.file_obj.tell()
+
+    def close(self):
+        self.file_obj.close()
+
+
+class _ParquetSink:
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.writer = None
+
+    def write(self, rows):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        table = pa.Table.from_pylist(rows)
+        if self.writer is None:
+            self.writer = pq.ParquetWriter(self.file_path, table.schema)
+        self.writer.write_table(table.cast(self.writer.schema))
+
+    def size(self):
+        # Bytes on disk so far; the footer is only added when the writer closes.
+        return os.path.getsize(self.file_path) if self.writer is not None else 0
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+class AuditLogWriter:
+    '''
+    Collects prediction records on a bounded in-memory queue and writes them
+    in batches from a background thread, one file per worker process.
+    '''
+    _STOP = object()
+
+    def __init__(self, config=None):
+        self.audit_log_config = config or AuditLogConfig()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._queue = None
+        self._spill_lock = threading.Lock()
+        self._sequence = itertools.count()
+        self.spilled = 0
+
+    def _ensure_started(self):
+        # Threads and open files do not survive fork(), so each worker gets its own.
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._queue = queue.Queue(maxsize=self.audit_log_config.max_queue_size)
+                self._thread = threading.Thread(target=self._run, name="audit-log", daemon=True)
+                self._thread.start()
+                atexit.register(self.close)
+
+    def log(self, record):
+        self.log_records([record])
+
+    def log_records(self, records):
+        self._ensure_started()
+        for i, record in enumerate(records):
+            try:
+                self._queue.put(record, timeout=self.audit_log_config.put_timeout)
+            except queue.Full:
+                self._spill(records[i:])
+                return
+
+    def _spill(self, records):
+        '''
+        Appends records the writer thread cannot take to a JSON-lines file
+        next to the audit log, one per worker process.
+        '''
+        config = self.audit_log_config
+        file_path = os.path.join(config.log_dir, f"{config.file_prefix}.spill.{os.getpid()}.jsonl")
+        try:
+            with self._spill_lock:
+                os.makedirs(config.log_dir, exist_ok=True)
+                with open(file_path, 'a') as file_obj:
+                    for record in records:
+                        file_obj.write(json.dumps(record, default=str) + '\n')
+                before, self.spilled = self.spilled, self.spilled + len(records)
+                if before == 0 or before // 1000 != self.spilled // 1000:
+                    logging.warning(f"Audit log spilled {self.spilled} records to {file_path} so far")
+        except Exception as e:
+            logging.error(f"Error occured while spilling the audit log: {e}")
+
+    def _file_format(self):
+        if self.audit_log_config.file_format == 'parquet':
+            try:
+                import pyarrow.parquet
+                return 'parquet'
+            except ImportError:
+                logging.warning("pyarrow is not installed, writing the audit log as csv")
+        return 'csv'
+
+    def _open_sink(self):
+        config = self.audit_log_config
+        os.makedirs(config.log_dir, exist_ok=True)
+        file_format = self._file_format()
+        # The sequence number keeps files rotated within the same second apart.
+        stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        file_name = f"{config.file_prefix}.{stamp}.{os.getpid()}.{next(self._sequence):04d}.{file_format}"
+        file_path = os.path.join(config.log_dir, file_name)
+        if file_format == 'parquet':
+            return _ParquetSink(file_path)
+        return _CsvSink(file_path)
+
+    def _write(self, sink, rows):
+        written = False
+        try:
+            if sink is None:
+                sink = self._open_sink()
+            sink.write(rows)
+            written = True
+            if sink.size() >= self.audit_log_config.max_file_bytes:
+                sink.close()
+                sink = None
+        except Exception as e:
+            logging.error(f"Error occured at audit log stage: {e}")
+            if not written:
+                self._spill(rows)
+        return sink
+
+    def _run(self):
+        config = self.audit_log_config
+        sink = None
+        rows = []
+        last_flush = time.monotonic()
+
+        while True:
+            timeout = max(0.0, config.flush_interval - (time.monotonic() - last_flush))
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+
+            stop = item is self._STOP
+            if item is not None and not stop:
+                rows.append(item)
+
+            if rows and (stop or len(rows) >= config.flush_batch_size or time.monotonic() - last_flush >= config.flush_interval):
+                sink = self._write(sink, rows)
+                rows = []
+            if not rows:
+                last_flush = time.monotonic()
+
+            if stop:
+                if sink is not None:
+                    sink.close()
+                return
+
+    def close(self, timeout=10.0):
+        try:
+            with self._lock:
+                thread = self._thread
+                if thread is None or self._pid != os.getpid():
+                    return
+                self._thread = None
+                self._queue.put(self._STOP)
+            thread.join(timeout)
+
+        except Exception as e:
+            logging.error(f"Error occured while closing the audit log: {e}")
+            raise CustomException(e, sys)
+
+
+_audit_log = AuditLogWriter()
+
+def get_audit_log():
+    return _audit_log
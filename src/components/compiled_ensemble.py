@@ -0,0 +1,414 @@
+import logging
+from src.exception import CustomException
+
+import os
+import sys
+import json
+import shutil
+import inspect
+import tempfile
+from importlib.metadata import version
+
+import numpy as np
+
+from src.components.compiled_preprocessor import model_input_dtype
+
+# Rows x trees cells traversed per block, bounding the temporary index arrays.
+BLOCK_CELLS = 1 << 20
+
+XGBOOST_IDENTITY_OBJECTIVES = ('reg:squarederror', 'reg:absoluteerror', 'reg:pseudohubererror')
+
+# Private HistGradientBoosting state read here and by incremental training.
+# It is not part of scikit-learn's API, so a release that renames it must
+# fail loudly instead of compiling a wrong model.
+HGB_PRIVATE_ATTRIBUTES = ('_predictors', '_baseline_prediction', '_bin_mapper')
+HGB_NODE_FIELDS = ('value', 'feature_idx', 'num_threshold', 'missing_go_to_left', 'left', 'right', 'is_leaf',
+                   'is_categorical')
+HGB_BIN_DATA_PARAMETERS = ('X', 'is_training_data')
+
+
+def _tree(feature, threshold, left, right, default_left, value):
+    '''
+    One tree as local node arrays. A node sends x left when x < threshold
+    (NaN follows default_left); leaves point at themselves, so a fixed
+    number of steps leaves every row on its leaf.
+    '''
+    return {
+        'feature': np.asarray(feature, dtype=np.int32),
+        'threshold': np.asarray(threshold, dtype=np.float64),
+        'left': np.asarray(left, dtype=np.int32),
+        'right': np.asarray(right, dtype=np.int32),
+        'default_left': np.asarray(default_left, dtype=bool),
+        'value': np.asarray(value, dtype=np.float64),
+    }
+
+
+def _mark_leaves(feature, threshold, left, right, is_leaf):
+    nodes = np.arange(len(left), dtype=np.int32)
+    left = np.where(is_leaf, nodes, left)
+    right = np.where(is_leaf, nodes, right)
+    feature = np.where(is_leaf, 0, feature)
+    threshold = np.where(is_leaf, 0.0, threshold)
+    return feature, threshold, left, right
+
+
+def _tree_depth(left, right):
+    max_depth, stack = 0, [(0, 0)]
+    while stack:
+        node, depth = stack.pop()
+        if left[node] == node:
+            max_depth = max(max_depth, depth)
+        else:
+            stack.extend(((left[node], depth + 1), (right[node], depth + 1)))
+    return max_depth
+
+
+def check_hist_gradient_boosting_internals(model, continuation=False):
+    '''
+    Raises RuntimeError when the fitted HistGradientBoosting model does not
+    expose the private attributes and node fields this module relies on.
+    With continuation, also checks the _bin_data(X, is_training_data) hook
+    that incremental training overrides to keep the original bin mapper.
+    '''
+    missing = [name for name in HGB_PRIVATE_ATTRIBUTES if not hasattr(model, name)]
+    if not missing and len(model._predictors) > 0:
+        fields = model._predictors[0][0].nodes.dtype.names or ()
+        missing = [f"nodes['{name}']" for name in HGB_NODE_FIELDS if name not in fields]
+    if continuation:
+        bin_data = getattr(model, '_bin_data', None)
+        if bin_data is None or list(inspect.signature(bin_data).parameters) != list(HGB_BIN_DATA_PARAMETERS):
+            missing.append(f"_bin_data({', '.join(HGB_BIN_DATA_PARAMETERS)})")
+    if missing:
+        raise RuntimeError(f"scikit-learn {version('scikit-learn')} changed the HistGradientBoosting internals "
+                           f"({', '.join(missing)}); compiled_ensemble and incremental_trainer need updating for it")
+
+
+def _hist_gradient_boosting_trees(model):
+    check_hist_gradient_boosting_internals(model)
+    if model.loss != 'squared_error':
+        raise ValueError(f"Only the squared_error loss can be compiled, got {model.loss}")
+    if getattr(model, '_preprocessor', None) is not None:
+        raise ValueError("HistGradientBoosting models with categorical features cannot be compiled")
+
+    trees = []
+    for predictors in model._predictors:
+        if len(predictors) != 1:
+            raise ValueError("Only single-output HistGradientBoosting models can be compiled")
+        nodes = predictors[0].nodes
+        if nodes['is_categorical'].any():
+            raise ValueError("HistGradientBoosting categorical splits cannot be compiled")
+
+        is_leaf = nodes['is_leaf'].astype(bool)
+        # sklearn goes left when x <= threshold.
+        threshold = np.nextafter(nodes['num_threshold'].astype(np.float64), np.inf)
+        feature, threshold, left, right = _mark_leaves(nodes['feature_idx'], threshold, nodes['left'],
+                                                       nodes['right'], is_leaf)
+        trees.append(_tree(feature, threshold, left, right, nodes['missing_go_to_left'],
+                           np.where(is_leaf, nodes['value'], 0.0)))
+
+    base_score = float(np.ravel(model._baseline_prediction)[0])
+    return trees, base_score
+
+
+def _parse_base_score(value):
+    # XGBoost >= 3 writes a vector such as "[6.2E1]".
+    return float(str(value).strip('[]').split(',')[0])
+
+
+def _xgboost_trees(model):
+    booster = model.get_booster()
+    learner = json.loads(booster.save_raw(raw_format='json'))['learner']
+
+    objective = learner['objective']['name']
+    if objective not in XGBOOST_IDENTITY_OBJECTIVES:
+        raise ValueError(f"XGBoost objective {objective} cannot be compiled")
+    gradient_booster = learner['gradient_booster']
+    if gradient_booster['name'] != 'gbtree':
+        raise ValueError(f"XGBoost booster {gradient_booster['name']} cannot be compiled")
+
+    tree_dumps = gradient_booster['model']['trees']
+    best_iteration = booster.attr('best_iteration')
+    if best_iteration is not None:
+        # predict() stops at the early-stopping iteration.
+        tree_dumps = tree_dumps[:gradient_booster['model']['iteration_indptr'][int(best_iteration) + 1]]
+
+    trees = []
+    for dump in tree_dumps:
+        if any(dump['split_type']):
+            raise ValueError("XGBoost categorical splits cannot be compiled")
+        left = np.asarray(dump['left_children'])
+        is_leaf = left == -1
+        # Thresholds and leaf values are float32 values; XGBoost goes left when x < threshold.
+        split_conditions = np.asarray(dump['split_conditions'], dtype=np.float32).astype(np.float64)
+        feature, threshold, left, right = _mark_leaves(dump['split_indices'], split_conditions, left,
+                                                       dump['right_children'], is_leaf)
+        trees.append(_tree(feature, threshold, left, right, dump['default_left'],
+                           np.where(is_leaf, split_conditions, 0.0)))
+
+    return trees, _parse_base_score(learner['learner_model_param']['base_score'])
+
+
+def _oblivious_tree(splits, leaf_values, feature_index, nan_left):
+    '''
+    Expands a CatBoost oblivious tree into a complete binary tree. Level k
+    tests splits[k], which sets bit k of the leaf index when x > border.
+    '''
+    depth = len(splits)
+    n_internal = (1 << depth) - 1
+    n_nodes = n_internal + (1 << depth)
+
+    feature = np.zeros(n_nodes, dtype=np.int32)
+    threshold = np.zeros(n_nodes)
+    default_left = np.zeros(n_nodes, dtype=bool)
+    left = np.arange(n_nodes, dtype=np.int32)
+    right = np.arange(n_nodes, dtype=np.int32)
+    value = np.zeros(n_nodes)
+
+    # Heap layout; the low `level` bits of `prefix` are the path taken so far.
+    for level, split in enumerate(splits):
+        if split['split_type'] != 'FloatFeature':
+            raise ValueError(f"CatBoost {split['split_type']} splits cannot be compiled")
+        column = feature_index[split['float_feature_index']]
+        border = np.float64(np.float32(split['border']))
+        for prefix in range(1 << level):
+            node = (1 << level) - 1 + prefix
+            feature[node] = column
+            # CatBoost goes right when x > border.
+            threshold[node] = np.nextafter(border, np.inf)
+            default_left[node] = nan_left[split['float_feature_index']]
+            left[node] = (1 << (level + 1)) - 1 + prefix
+            right[node] = (1 << (level + 1)) - 1 + prefix + (1 << level)
+
+    value[n_internal:] = np.asarray(leaf_values, dtype=np.float64)
+    return _tree(feature, threshold, left, right, default_left, value)
+
+
+def _catboost_trees(model):
+    tmp_dir = tempfile.mkdtemp(prefix="catboost_json_")
+    try:
+        file_path = os.path.join(tmp_dir, 'model.json')
+        model.save_model(file_path, format='json')
+        with open(file_path) as file_obj:
+            dump = json.load(file_obj)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    if 'oblivious_trees' not in dump:
+        raise ValueError("Only symmetric (oblivious) CatBoost trees can be compiled")
+
+    float_features = dump['features_info']['float_features']
+    feature_index = [info['flat_feature_index'] for info in float_features]
+    nan_left = [info.get('nan_value_treatment') != 'AsTrue' for info in float_features]
+
+    scale, bias = model.get_scale_and_bias()
+    bias = float(np.ravel(bias)[0])
+    trees = []
+    for tree in dump['oblivious_trees']:
+        if len(tree['leaf_values']) != 1 << len(tree['splits']):
+            raise ValueError("Only single-output CatBoost models can be compiled")
+        trees.append(_oblivious_tree(tree['splits'], np.asarray(tree['leaf_values']) * scale,
+                                     feature_index, nan_left))
+    return trees, bias
+
+
+def extract_trees(model):
+    '''
+    Returns (trees, base_score) for the fitted ensembles ModelTrainer
+    builds, or raises ValueError for anything else.
+    '''
+    library = type(model).__module__.split('.')[0]
+    if library == 'xgboost':
+        return _xgboost_trees(model)
+    if library == 'catboost':
+        return _catboost_trees(model)
+    if library == 'sklearn' and type(model).__name__ == 'HistGradientBoostingRegressor':
+        return _hist_gradient_boosting_trees(model)
+    raise ValueError(f"{type(model).__name__} is not a supported tree ensemble")
+
+
+class CompiledEnsemble:
+    '''
+    A fitted gradient boosted ensemble flattened into contiguous node
+    arrays. predict() walks every tree for a block of rows at once with
+    NumPy gathers, so serving needs neither the boosting library nor its
+    input conversion.
+    '''
+    def __init__(self, feature, threshold, left, right, default_left, value, tree_offsets,
+                 base_score, max_depth, n_features, input_dtype='float64', source=''):
+        self.feature = np.asarray(feature, dtype=np.int32)
+        self.threshold = np.asarray(threshold, dtype=np.float64)
+        self.left = np.asarray(left, dtype=np.int32)
+        self.right = np.asarray(right, dtype=np.int32)
+        self.default_left = np.asarray(default_left, dtype=bool)
+        self.value = np.asarray(value, dtype=np.float64)
+        self.tree_offsets = np.asarray(tree_offsets, dtype=np.int32)
+        self.base_score = float(base_score)
+        self.max_depth = int(max_depth)
+        self.n_features = int(n_features)
+        self.input_dtype = np.dtype(input_dtype).type
+        self.source = source
+        # Left and right child of node i at 2i and 2i + 1, one gather per level.
+        self._children = np.stack([self.left, self.right], axis=1).ravel().astype(np.intp)
+
+    @property
+    def n_trees(self):
+        return len(self.tree_offsets) - 1
+
+    @classmethod
+    def from_trees(cls, trees, base_score, n_features, input_dtype='float64', source=''):
+        sizes = [len(tree['left']) for tree in trees]
+        tree_offsets = np.concatenate([[0], np.cumsum(sizes)]).astype(np.int32)
+
+        def stack(name, shift=False):
+            return np.concatenate([tree[name] + (offset if shift else 0)
+                                   for tree, offset in zip(trees, tree_offsets[:-1])])
+
+        max_depth = max((_tree_depth(tree['left'], tree['right']) for tree in trees), default=0)
+        return cls(feature=stack('feature'), threshold=stack('threshold'), left=stack('left', shift=True),
+                   right=stack('right', shift=True), default_left=stack('default_left'), value=stack('value'),
+                   tree_offsets=tree_offsets, base_score=base_score, max_depth=max_depth,
+                   n_features=n_features, input_dtype=input_dtype, source=source)
+
+    def tree(self, index):
+        start, stop = self.tree_offsets[index], self.tree_offsets[index + 1]
+        return _tree(self.feature[start:stop], self.threshold[start:stop], self.left[start:stop] - start,
+                     self.right[start:stop] - start, self.default_left[start:stop], self.value[start:stop])
+
+    def _leaves(self, X):
+        '''
+        Leaf node of every tree for every row of X, shape (rows, trees).
+        '''
+        X = np.ascontiguousarray(X)
+        flat_X = X.ravel()
+        row_offsets = (np.arange(len(X), dtype=np.intp) * X.shape[1])[:, None]
+        nodes = np.broadcast_to(self.tree_offsets[:-1].astype(np.intp), (len(X), self.n_trees))
+        has_nan = np.isnan(flat_X).any()
+        for _ in range(self.max_depth):
+            x = flat_X.take(row_offsets + self.feature.take(nodes))
+            go_right = x >= self.threshold.take(nodes)
+            if has_nan:
+                missing = np.isnan(x)
+                go_right[missing] = ~self.default_left.take(nodes[missing])
+            nodes = self._children.take(2 * nodes + go_right)
+        return nodes
+
+    def tree_outputs(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        return self.value[self._leaves(X)]
+
+    def predict(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError(f"Expected an array of shape (n_rows, {self.n_features}), got {X.shape}")
+
+        out = np.full(len(X), self.base_score)
+        block = max(1, BLOCK_CELLS // max(1, self.n_trees))
+        for start in range(0, len(X), block):
+            out[start:start + block] += self.value[self._leaves(X[start:start + block])].sum(axis=1)
+        return out
+
+    def prune(self, X, tolerance):
+        '''
+        Drops the trees contributing least on the sample X, folding each
+        one's mean output on X into base_score, for as long as no row of X
+        moves by more than `tolerance` from the unpruned prediction.
+        '''
+        outputs = self.tree_outputs(X)
+        means = outputs.mean(axis=0)
+        deviations = outputs - means
+        order = np.argsort(np.abs(deviations).mean(axis=0), kind='stable')
+
+        # Largest drift over the rows after dropping the first k trees of `order`.
+        drift = np.abs(np.cumsum(deviations[:, order], axis=1)).max(axis=0)
+        exceeded = np.flatnonzero(drift > tolerance)
+        n_dropped = min(int(exceeded[0]) if len(exceeded) else self.n_trees, self.n_trees - 1)
+        if n_dropped <= 0:
+            return self
+
+        dropped, kept = order[:n_dropped], np.sort(order[n_dropped:])
+        logging.info(f"Pruned {n_dropped} of {self.n_trees} trees, max drift {drift[n_dropped - 1]:.3g} on {len(X)} rows")
+        return CompiledEnsemble.from_trees([self.tree(index) for index in kept],
+                                           self.base_score + float(means[dropped].sum()),
+                                           n_features=self.n_features,
+                                           input_dtype=np.dtype(self.input_dtype).name, source=self.source)
+
+    def to_arrays(self):
+        '''
+        Splits the ensemble into JSON-able metadata and plain NumPy arrays.
+        '''
+        meta = {
+            'base_score': self.base_score,
+            'max_depth': self.max_depth,
+            'n_features': self.n_features,
+            'input_dtype': np.dtype(self.input_dtype).name,
+            'source': self.source,
+        }
+        arrays = {
+            'feature': self.feature,
+            'threshold': self.threshold,
+            'left': self.left,
+            'right': self.right,
+            'default_left': self.default_left,
+            'value': self.value,
+            'tree_offsets': self.tree_offsets,
+        }
+        return meta, arrays
+
+    @classmethod
+    def from_arrays(cls, meta, arrays):
+        return cls(
+            feature=arrays['feature'],
+            threshold=arrays['threshold'],
+            left=arrays['left'],
+            right=arrays['right'],
+            default_left=arrays['default_left'],
+            value=arrays['value'],
+            tree_offsets=arrays['tree_offsets'],
+            base_score=meta['base_score'],
+            max_depth=meta['max_depth'],
+            n_features=meta['n_features'],
+            input_dtype=meta['input_dtype'],
+            source=meta['source'],
+        )
+
+
+def export_compiled_ensemble(model, sample, rtol=1e-5, atol=1e-4, prune_tolerance=0.0):
+    '''
+    Compiles `model`, optionally prunes it within `prune_tolerance` on the
+    transformed feature rows in `sample`, and checks the result against
+    model.predict on them. Returns None for models that are not tree
+    ensembles.
+    '''
+    try:
+        trees, base_score = extract_trees(model)
+    except ValueError as e:
+        logging.info(f"Model is not compiled: {e}")
+        return None
+    except RuntimeError as e:
+        logging.error(f"Error occured at compiled ensemble export stage: {e}")
+        raise CustomException(e, sys)
+
+    try:
+        compiled = CompiledEnsemble.from_trees(trees, base_score, n_features=model.n_features_in_,
+                                               input_dtype=np.dtype(model_input_dtype(model)).name,
+                                               source=f"{type(model).__module__}.{type(model).__qualname__}")
+
+        sample = np.asarray(sample, dtype=compiled.input_dtype)
+        if len(sample) == 0:
+            raise ValueError("A non-empty sample is needed to verify the compiled ensemble")
+        if prune_tolerance > 0:
+            compiled = compiled.prune(sample, prune_tolerance)
+
+        expected = np.asarray(model.predict(sample), dtype=np.float64)
+        actual = compiled.predict(sample)
+        if not np.allclose(actual, expected, rtol=rtol, atol=atol + prune_tolerance):
+            raise ValueError(f"Compiled ensemble deviates from {type(model).__name__} by up to "
+                             f"{np.max(np.abs(actual - expected))}")
+
+        logging.info(f"Compiled {type(model).__name__} into {compiled.n_trees} trees, "
+                     f"{len(compiled.value)} nodes, depth {compiled.max_depth}")
+        return compiled
+
+    except Exception as e:
+        logging.error(f"Error occured at compiled ensemble export stage: {e}")
+        raise CustomException(e, sys)
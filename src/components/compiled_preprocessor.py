@@ -0,0 +1,245 @@
+import logging
+from src.exception import CustomException
+
+import os
+import sys
+import json
+import math
+
+import numpy as np
+
+from src.components.features import FOCUS_FEATURES, FOCUS_INPUTS, add_focus_features
+
+
+def _scaler_arrays(scaler, n_features):
+    mean = scaler.mean_ if scaler.with_mean else np.zeros(n_features)
+    scale = scaler.scale_ if scaler.with_std else np.ones(n_features)
+    return np.asarray(mean, dtype=np.float64), np.asarray(scale, dtype=np.float64)
+
+
+def model_input_dtype(model):
+    '''
+    XGBoost and CatBoost work in float32 internally, so float32 features are
+    exact for them. Other models (e.g. a linear model on collinear one-hot
+    columns) can lose precision and get float64.
+    '''
+    if type(model).__module__.split('.')[0] in ('xgboost', 'catboost'):
+        return np.float32
+    return np.float64
+
+
+def _is_missing(value):
+    # SimpleImputer only imputes NaN; None is passed on as an unknown category.
+    return isinstance(value, float) and math.isnan(value)
+
+
+class CompiledPreprocessor:
+    '''
+    Flat NumPy version of the fitted ColumnTransformer built by
+    DataTransformation: median imputation, the focus features, standard
+    scaling, most-frequent imputation and scaled one-hot lookups. Turns raw
+    records into float32/float64 feature vectors without sklearn or pandas.
+    '''
+    def __init__(self, num_columns, num_fill, keep_index, focus_index, add_focus_index,
+                 num_mean, num_scale, cat_columns, cat_fill, categories, cat_scale):
+        self.num_columns = list(num_columns)
+        self.num_fill = np.asarray(num_fill, dtype=np.float64)
+        self.keep_index = np.asarray(keep_index, dtype=np.intp)
+        self.focus_index = np.asarray(focus_index, dtype=np.intp)
+        self.add_focus_index = bool(add_focus_index)
+        self.num_mean = np.asarray(num_mean, dtype=np.float64)
+        self.num_scale = np.asarray(num_scale, dtype=np.float64)
+        self.cat_columns = list(cat_columns)
+        self.cat_fill = [str(value) for value in cat_fill]
+        self.categories = [[str(value) for value in column] for column in categories]
+        self.cat_scale = np.asarray(cat_scale, dtype=np.float64)
+
+        self.n_num_out = len(self.num_mean)
+        self.n_features_out = self.n_num_out + len(self.cat_scale)
+
+        # One lookup per categorical column mapping a category string to its
+        # output slot; the scaled one-hot value of every slot is precomputed.
+        self._lookups = []
+        offset = self.n_num_out
+        for column_categories in self.categories:
+            self._lookups.append({category: offset + i for i, category in enumerate(column_categories)})
+            offset += len(column_categories)
+        self._slot_value = np.zeros(self.n_features_out, dtype=np.float64)
+        self._slot_value[self.n_num_out:] = 1.0 / self.cat_scale
+
+    @classmethod
+    def from_preprocessor(cls, preprocessor):
+        try:
+            transformers = {name: (pipe, list(columns)) for name, pipe, columns in preprocessor.transformers_
+                            if name != 'remainder'}
+            num_pipe, num_columns = transformers['num_pipeline']
+            cat_pipe, cat_columns = transformers['cat_pipeline']
+
+            imputer, adder, scaler = num_pipe['imputer'], num_pipe['feature_adder'], num_pipe['scaler']
+            if len(imputer.statistics_) != len(num_columns):
+                raise ValueError("Numeric imputer dropped empty features, cannot compile")
+
+            keep = [i for i, column in enumerate(num_columns) if column != 'id']
+            focus = [num_columns.index(column) for column in FOCUS_INPUTS]
+            n_num_out = len(keep) + (len(FOCUS_FEATURES) if adder.add_focus_index else 0)
+            num_mean, num_scale = _scaler_arrays(scaler, n_num_out)
+
+            cat_imputer, encoder, cat_scaler = cat_pipe['imputer'], cat_pipe['one_hot_encoder'], cat_pipe['scaler']
+            if encoder.drop_idx_ is not None or getattr(encoder, '_infrequent_enabled', False):
+                raise ValueError("Only plain one-hot encoding can be compiled")
+            n_cat_out = sum(len(column) for column in encoder.categories_)
+            cat_mean, cat_scale = _scaler_arrays(cat_scaler, n_cat_out)
+            if np.any(cat_mean != 0):
+                raise ValueError("Centered one-hot scaling cannot be compiled")
+
+            return cls(
+                num_columns=num_columns,
+                num_fill=imputer.statistics_,
+                keep_index=keep,
+                focus_index=focus,
+                add_focus_index=adder.add_focus_index,
+                num_mean=num_mean,
+                num_scale=num_scale,
+                cat_columns=cat_columns,
+                cat_fill=cat_imputer.statistics_,
+                categories=encoder.categories_,
+                cat_scale=cat_scale,
+            )
+
+        except Exception as e:
+            logging.error(f"Error occured while compiling the preprocessor: {e}")
+            raise CustomException(e, sys)
+
+    def _numeric_block(self, num):
+        n_keep = len(self.keep_index)
+        out = np.empty(num.shape[:-1] + (self.n_num_out,), dtype=np.float64)
+        out[..., :n_keep] = num[..., self.keep_index]
+        if self.add_focus_index:
+            add_focus_features(num[..., self.focus_index[0]], num[..., self.focus_index[1]],
+                               num[..., self.focus_index[2]], out[..., n_keep:])
+        return out
+
+    def transform_record(self, record, dtype=np.float32):
+        out = np.zeros(self.n_features_out, dtype=dtype)
+
+        num = np.array([record.get(column) for column in self.num_columns], dtype=np.float64)
+        missing = np.isnan(num)
+        if missing.any():
+            num[missing] = self.num_fill[missing]
+        out[:self.n_num_out] = (self._numeric_block(num) - self.num_mean) / self.num_scale
+
+        for column, fill, lookup in zip(self.cat_columns, self.cat_fill, self._lookups):
+            value = record.get(column)
+            slot = lookup.get(fill if _is_missing(value) else str(value))
+            # Unknown categories encode as all zeros, like handle_unknown='ignore'.
+            if slot is not None:
+                out[slot] = self._slot_value[slot]
+
+        return out
+
+    def transform_records(self, records, dtype=np.float32):
+        out = np.zeros((len(records), self.n_features_out), dtype=dtype)
+        for row, record in enumerate(records):
+            out[row] = self.transform_record(record, dtype=dtype)
+        return out
+
+    def transform(self, X, dtype=np.float32):
+        '''
+        Vectorized transform of a DataFrame holding the raw input columns.
+        '''
+        n_rows = len(X)
+        out = np.zeros((n_rows, self.n_features_out), dtype=dtype)
+
+        num = X[self.num_columns].to_numpy(dtype=np.float64, na_value=np.nan)
+        missing = np.isnan(num)
+        if missing.any():
+            num = np.where(missing, self.num_fill, num)
+        out[:, :self.n_num_out] = (self._numeric_block(num) - self.num_mean) / self.num_scale
+
+        rows = np.arange(n_rows)
+        for column, fill, lookup in zip(self.cat_columns, self.cat_fill, self._lookups):
+            values = X[column].to_numpy(dtype=object)
+            missing = np.array([_is_missing(value) for value in values], dtype=bool)
+            values = np.where(missing, fill, values).astype(str)
+            slots = np.fromiter((lookup.get(value, -1) for value in values), dtype=np.intp, count=n_rows)
+            known = slots >= 0
+            out[rows[known], slots[known]] = self._slot_value[slots[known]]
+
+        return out
+
+    def to_arrays(self):
+        '''
+        Splits the kernel into JSON-able metadata and plain NumPy arrays.
+        '''
+        meta = {
+            'num_columns': self.num_columns,
+            'cat_columns': self.cat_columns,
+            'cat_fill': self.cat_fill,
+            'categories': self.categories,
+            'add_focus_index': self.add_focus_index,
+        }
+        arrays = {
+            'num_fill': self.num_fill,
+            'keep_index': self.keep_index,
+            'focus_index': self.focus_index,
+            'num_mean': self.num_mean,
+            'num_scale': self.num_scale,
+            'cat_scale': self.cat_scale,
+        }
+        return meta, arrays
+
+    @classmethod
+    def from_arrays(cls, meta, arrays):
+        return cls(
+            num_columns=meta['num_columns'],
+            num_fill=arrays['num_fill'],
+            keep_index=arrays['keep_index'],
+            focus_index=arrays['focus_index'],
+            add_focus_index=meta['add_focus_index'],
+            num_mean=arrays['num_mean'],
+            num_scale=arrays['num_scale'],
+            cat_columns=meta['cat_columns'],
+            cat_fill=meta['cat_fill'],
+            categories=meta['categories'],
+            cat_scale=arrays['cat_scale'],
+        )
+
+    def save(self, file_path):
+        meta, arrays = self.to_arrays()
+        os.makedirs(os.path.dirname(file_path) or '.', exist_ok=True)
+        tmp_path = f"{file_path}.tmp.{os.getpid()}.npz"
+        np.savez(tmp_path, meta=np.array(json.dumps(meta)), **arrays)
+        os.replace(tmp_path, file_path)
+
+    @classmethod
+    def load(cls, file_path):
+        with np.load(file_path, allow_pickle=False) as arrays:
+            meta = json.loads(str(arrays['meta']))
+            return cls.from_arrays(meta, arrays)
+
+
+def export_compiled_preprocessor(preprocessor, file_path, sample=None, rtol=1e-4, atol=1e-4):
+    '''
+    Compiles the fitted preprocessor, checks it against sklearn on `sample`
+    when given, and saves it next to the pickled preprocessor.
+    '''
+    try:
+        compiled = CompiledPreprocessor.from_preprocessor(preprocessor)
+
+        if sample is not None and len(sample) > 0:
+            expected = np.asarray(preprocessor.transform(sample), dtype=np.float64)
+            for actual in (compiled.transform(sample, dtype=np.float64),
+                           compiled.transform_records(sample.to_dict(orient='records'), dtype=np.float64)):
+                finite = np.isfinite(expected)
+                if not (np.array_equal(finite, np.isfinite(actual))
+                        and np.allclose(actual[finite], expected[finite], rtol=rtol, atol=atol)):
+                    max_error = np.max(np.abs(actual[finite] - expected[finite]))
+                    raise ValueError(f"Compiled preprocessor deviates from sklearn by up to {max_error}")
+
+        compiled.save(file_path)
+        logging.info(f"Compiled preprocessor saved at {file_path}")
+        return compiled
+
+    except Exception as e:
+        logging.error(f"Error occured at compiled preprocessor export stage: {e}")
+        raise CustomException(e, sys)
@@ -1,40 +1,79 @@
 import logging
-import src.logger
 from src.exception import CustomException
+from src.utils import save_frame, downcast_frame
 
 import os
 import sys
 from sklearn.model_selection import train_test_split
 from dataclasses import dataclass
+import numpy as np
 import pandas as pd
 
+# Known column types of the student dataset; anything else is downcast after reading.
+COMPACT_DTYPES = {
+    'id': 'int32',
+    'study_hours': 'float32',
+    'class_attendance': 'float32',
+    'sleep_hours': 'float32',
+    'exam_score': 'float32',
+    'gender': 'category',
+    'course': 'category',
+    'internet_access': 'category',
+    'sleep_quality': 'category',
+    'study_method': 'category',
+    'facility_rating': 'category',
+    'exam_difficulty': 'category',
+}
+
 @dataclass
 class DataIngestionConfig:
-    train_data_path: str = os.path.join('artifacts', 'train.csv')
-    test_data_path: str = os.path.join('artifacts', 'test.csv')
-    raw_data_path: str = os.path.join('artifacts', 'raw.csv')
+    source_data_path: str = os.path.join('notebook', 'data', 'data.csv')
+    train_data_path: str = os.path.join('artifacts', 'train.parquet')
+    test_data_path: str = os.path.join('artifacts', 'test.parquet')
+    raw_data_path: str = os.path.join('artifacts', 'raw.parquet')
+    # Read with compact dtypes (category, int8/int16/int32, float32).
+    low_memory: bool = False
+    # Rows read per CSV chunk by the out-of-core path.
+    chunk_size: int = 100_000
+    test_size: float = 0.2
+
+
+def id_bucket(ids, n_buckets=10_000):
+    '''
+    Stable bucket in [0, n_buckets) per row id (splitmix64 finalizer), so a
+    row lands in the same split whichever chunk it is read in.
+    '''
+    with np.errstate(over='ignore'):
+        x = np.asarray(ids).astype(np.uint64)
+        x = (x ^ (x >> np.uint64(30))) * np.uint64(0xbf58476d1ce4e5b9)
+        x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94d049bb133111eb)
+        x = x ^ (x >> np.uint64(31))
+    return x % np.uint64(n_buckets)
 
 
 class DataIngestion:
-    def __init__(self):
-        self.ingestion_config = DataIngestionConfig()
+    def __init__(self, config=None):
+        self.ingestion_config = config or DataIngestionConfig()
 
     def initiate_data_ingestion(self):
         logging.info('Data Ingestion methods Starts')
         try:
-            df = pd.read_csv('notebook/data/data.csv')
-            logging.info('Dataset read as pandas DataFrame at notebook/data/data.csv')
+            if self.ingestion_config.low_memory:
+                df = downcast_frame(pd.read_csv(self.ingestion_config.source_data_path, dtype=COMPACT_DTYPES))
+            else:
+                df = pd.read_csv(self.ingestion_config.source_data_path)
+            logging.info(f'Dataset read as pandas DataFrame at {self.ingestion_config.source_data_path}')
 
             os.makedirs(os.path.dirname(self.ingestion_config.train_data_path), exist_ok=True)
 
-            df.to_csv(self.ingestion_config.raw_data_path, index=False, header=True)
+            save_frame(df, self.ingestion_config.raw_data_path)
             logging.info(f"Raw data is saved at {self.ingestion_config.raw_data_path}")
 
             logging.info("Train test split 80-20")
             train_set, test_set = train_test_split(df, test_size=0.2, random_state=42)
 
-            train_set.to_csv(self.ingestion_config.train_data_path, index=False, header=True)
-            test_set.to_csv(self.ingestion_config.test_data_path, index=False, header=True)
+            save_frame(train_set, self.ingestion_config.train_data_path)
+            save_frame(test_set, self.ingestion_config.test_data_path)
 
             logging.info(f"Ingestion of train test data is completed with files saved at:")
             logging.info(f"Train path: {self.ingestion_config.train_data_path}")
@@ -46,4 +85,55 @@ class DataIngestion:
             )
         except Exception as e:
             logging.error(f"Error occured at Data Ingestion stage: {e}")
-            raise CustomException(e, sys)
\ No newline at end of file
+            raise CustomException(e, sys)
+
+    def initiate_streaming_ingestion(self):
+        '''
+        Out-of-core variant: reads the CSV in chunks and appends every chunk to
+        train/test Parquet files split by a hash of the row id, so memory is
+        bounded by the chunk size instead of the dataset size.
+        '''
+        logging.info('Streaming Data Ingestion methods Starts')
+        config = self.ingestion_config
+        writers = {}
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            os.makedirs(os.path.dirname(config.train_data_path), exist_ok=True)
+            paths = {'train': config.train_data_path, 'test': config.test_data_path}
+
+            # Fixed dtypes keep every chunk on the same Parquet schema; strings
+            # stay plain so chunk-local category sets do not leak into it.
+            columns = pd.read_csv(config.source_data_path, nrows=0).columns
+            dtypes = {column: COMPACT_DTYPES.get(column, 'float32') for column in columns}
+            dtypes = {column: (object if dtype == 'category' else dtype) for column, dtype in dtypes.items()}
+
+            n_rows = {'train': 0, 'test': 0}
+            for chunk in pd.read_csv(config.source_data_path, dtype=dtypes, chunksize=config.chunk_size):
+                is_test = id_bucket(chunk['id'].to_numpy()) < int(config.test_size * 10_000)
+                for split, part in (('train', chunk[~is_test]), ('test', chunk[is_test])):
+                    table = pa.Table.from_pandas(part, preserve_index=False)
+                    if split not in writers:
+                        writers[split] = pq.ParquetWriter(f"{paths[split]}.tmp.{os.getpid()}", table.schema)
+                    writers[split].write_table(table.cast(writers[split].schema))
+                    n_rows[split] += len(part)
+
+            for split, writer in writers.items():
+                writer.close()
+                os.replace(f"{paths[split]}.tmp.{os.getpid()}", paths[split])
+            writers = {}
+
+            logging.info(f"Streaming ingestion wrote {n_rows['train']} train and {n_rows['test']} test rows")
+            logging.info(f"Train path: {config.train_data_path}")
+            logging.info(f"Test path: {config.test_data_path}")
+
+            return (
+                config.train_data_path,
+                config.test_data_path,
+            )
+        except Exception as e:
+            for writer in writers.values():
+                writer.close()
+            logging.error(f"Error occured at Streaming Data Ingestion stage: {e}")
+            raise CustomException(e, sys)
@@ -6,8 +6,9 @@ import os
 from dataclasses import dataclass
 from src.exception import CustomException
 import logging
-import src.logger
-from src.utils import save_object
+from src.utils import save_object, load_frame, open_array, load_array, downcast_frame
+from src.components.compiled_preprocessor import export_compiled_preprocessor
+from src.components.features import FOCUS_FEATURES, FOCUS_INPUTS, add_focus_features
 
 import numpy as np
 import pandas as pd
@@ -17,33 +18,60 @@ from sklearn.pipeline import Pipeline
 from sklearn.preprocessing import OneHotEncoder, StandardScaler
 
 from sklearn.base import BaseEstimator, TransformerMixin
+from sklearn.utils.validation import check_is_fitted
 
 class CustomFeatureAdder(BaseEstimator, TransformerMixin):
-    def __init__(self, add_focus_index=True):
+    '''
+    Drops id and appends the focus features. Accepts a DataFrame or an
+    ndarray; an ndarray's columns are named by `feature_names`, or x0..xn
+    when it is not given, in which case the focus features cannot be added.
+    '''
+    def __init__(self, add_focus_index=True, feature_names=None):
         self.add_focus_index = add_focus_index
-        self.feature_names_in_ = []
+        self.feature_names = feature_names
 
     def fit(self, X, y=None):
-        self.feature_names_in_ = list(X.columns)
+        if hasattr(X, 'columns'):
+            names = list(X.columns)
+        else:
+            n_columns = np.shape(X)[1]
+            names = [f"x{i}" for i in range(n_columns)] if self.feature_names is None else list(self.feature_names)
+            if len(names) != n_columns:
+                raise ValueError(f"feature_names has {len(names)} names for {n_columns} columns")
+
+        missing = [name for name in FOCUS_INPUTS if name not in names] if self.add_focus_index else []
+        if missing:
+            raise ValueError(f"The focus features need the columns {missing}; pass feature_names with an ndarray")
+
+        self.feature_names_in_ = names
+        self.n_features_in_ = len(names)
         return self
 
     def transform(self, X):
-        X_df = pd.DataFrame(X, columns=self.feature_names_in_).copy()
+        check_is_fitted(self, 'feature_names_in_')
+        names = list(self.feature_names_in_)
+        if hasattr(X, 'columns'):
+            # A float frame in the fitted column order converts without a copy.
+            X = X if list(X.columns) == names else X[names]
+            data = X.to_numpy(dtype=np.float64, copy=False)
+        else:
+            data = np.asarray(X, dtype=np.float64)
+
+        keep = [i for i, name in enumerate(names) if name != 'id']
+        n_out = len(keep) + (len(FOCUS_FEATURES) if self.add_focus_index else 0)
+        out = np.empty((data.shape[0], n_out), dtype=np.float64)
+        np.take(data, keep, axis=1, out=out[:, :len(keep)])
 
-        if 'id' in X_df.columns:
-            X_df = X_df.drop(columns=['id'], axis=1) 
-            
         if self.add_focus_index:
-            logging.info("add_focus_index == True, adding new features...")
-            X_df['academic_effort'] = X_df['study_hours'] * X_df['class_attendance']
-            X_df['academic_focus_seconds'] = (X_df['study_hours'] / X_df['class_attendance']) * 3600
-            X_df['productivity'] = X_df['study_hours'] * X_df['sleep_hours']
+            study_hours, class_attendance, sleep_hours = (data[:, names.index(name)] for name in FOCUS_INPUTS)
+            add_focus_features(study_hours, class_attendance, sleep_hours, out[:, len(keep):])
+
+        return out
 
-        return X_df
-    
     def get_feature_names_out(self, input_features=None):
         if input_features is None or len(input_features) == 0:
-            feature_names = self.feature_names_in_.copy()
+            check_is_fitted(self, 'feature_names_in_')
+            feature_names = list(self.feature_names_in_)
         else:
             feature_names = list(input_features)
 
@@ -51,18 +79,38 @@ class CustomFeatureAdder(BaseEstimator, TransformerMixin):
             feature_names.remove('id')
 
         if self.add_focus_index:
-            feature_names.extend(['academic_effort', 'academic_focus_seconds', 'productivity'])
+            feature_names.extend(FOCUS_FEATURES)
 
-        return np.array(feature_names)
+        return np.array(feature_names, dtype=object)
 
 
 @dataclass
 class DataTransformationConfig:
     preprocessor_obj_file_path = os.path.join('artifacts', 'preprocessor.pkl')
+    compiled_preprocessor_file_path = os.path.join('artifacts', 'preprocessor_compiled.npz')
+    X_train_file_path = os.path.join('artifacts', 'X_train.npy')
+    y_train_file_path = os.path.join('artifacts', 'y_train.npy')
+    X_test_file_path = os.path.join('artifacts', 'X_test.npy')
+    y_test_file_path = os.path.join('artifacts', 'y_test.npy')
+    # Compact input dtypes and float32 matrices for the models.
+    low_memory: bool = False
+    # Rows transformed per call when filling the on-disk matrices.
+    chunk_size: int = 100_000
+    # Out-of-core fit: rows kept in the uniform sample the imputers and
+    # encoder are fitted on; scalers and category counts see every row.
+    sample_size: int = 100_000
+    random_state: int = 42
+
+
+def most_frequent(counts):
+    # Same tie-break as SimpleImputer: the smallest of the most common values.
+    top = counts[counts == counts.max()]
+    return sorted(top.index)[0]
+
 
 class DataTransformation:
-    def __init__(self):
-        self.data_transformation_config = DataTransformationConfig()
+    def __init__(self, config=None):
+        self.data_transformation_config = config or DataTransformationConfig()
 
     def get_data_transformer_object(self):
         try:
@@ -89,7 +137,7 @@ class DataTransformation:
             preprocessor = ColumnTransformer(
                 [
                     ("num_pipeline", num_pipeline, make_column_selector(dtype_include=np.number)),
-                    ("cat_pipeline", cat_pipeline, make_column_selector(dtype_include=object)),
+                    ("cat_pipeline", cat_pipeline, make_column_selector(dtype_include=[object, 'category'])),
                 ]
             )
 
@@ -102,46 +150,217 @@ class DataTransformation:
             raise CustomException(e, sys)
         
 
+    def export_compiled_preprocessor(self, preprocessor, sample):
+        compiled_path = self.data_transformation_config.compiled_preprocessor_file_path
+        try:
+            export_compiled_preprocessor(preprocessor, compiled_path, sample=sample)
+        except CustomException:
+            # Serving falls back to preprocessor.pkl; a stale kernel must not outlive it.
+            logging.error("Compiled preprocessor export failed, serving will use the sklearn preprocessor")
+            if os.path.isfile(compiled_path):
+                os.remove(compiled_path)
+
+    def matrix_dtype(self):
+        return np.float32 if self.data_transformation_config.low_memory else np.float64
+
+    def save_features(self, file_path, preprocessor, input_feature_df):
+        '''
+        Transforms in chunks straight into a .npy file and returns it
+        memory-mapped read-only, so the full matrix is never held twice.
+        '''
+        chunk_size = self.data_transformation_config.chunk_size
+        n_features = len(preprocessor.get_feature_names_out())
+        arr = open_array(file_path, (len(input_feature_df), n_features), dtype=self.matrix_dtype())
+
+        for start in range(0, len(input_feature_df), chunk_size):
+            chunk = preprocessor.transform(input_feature_df.iloc[start:start + chunk_size])
+            arr[start:start + chunk_size] = np.asarray(chunk, dtype=arr.dtype)
+
+        arr.flush()
+        del arr
+        logging.info(f"Transformed features saved at {file_path}")
+        return load_array(file_path)
+
+    def save_target(self, file_path, target):
+        arr = open_array(file_path, (len(target),), dtype=self.matrix_dtype())
+        arr[:] = target.to_numpy()
+        arr.flush()
+        del arr
+        return load_array(file_path)
+
+    def read_split(self, file_path):
+        df = load_frame(file_path)
+        if self.data_transformation_config.low_memory:
+            df = downcast_frame(df)
+        target = df.pop('exam_score')
+        return df, target
+
     def initiate_data_transformation(self, train_path, test_path):
         try:
+            config = self.data_transformation_config
             preprocessor = self.get_data_transformer_object()
 
             logging.info("Data Transformation Initiated")
 
-            train_df = pd.read_csv(train_path)
-            test_df = pd.read_csv(test_path)
-
-            input_feature_train_df = train_df.drop(columns=['exam_score'], axis=1)
-            target_feature_train_df = train_df['exam_score']
-
-            input_feature_test_df = test_df.drop(columns=['exam_score'], axis=1)
-            target_feature_test_df = test_df['exam_score']
+            input_feature_train_df, target_feature_train_df = self.read_split(train_path)
 
             logging.info("Train Test Split Initiated")
 
-            input_feature_train_arr = preprocessor.fit_transform(input_feature_train_df)
-            input_feature_test_arr = preprocessor.transform(input_feature_test_df)
+            preprocessor.fit(input_feature_train_df)
 
             feature_names = preprocessor.get_feature_names_out()
             logging.info(f"Data Transformation Completed with feature names:")
             logging.info(f"{feature_names}")
 
-            train_arr = np.c_[np.array(input_feature_train_arr), np.array(target_feature_train_df)]
-            test_arr = np.c_[np.array(input_feature_test_arr), np.array(target_feature_test_df)]
+            X_train = self.save_features(config.X_train_file_path, preprocessor, input_feature_train_df)
+            y_train = self.save_target(config.y_train_file_path, target_feature_train_df)
+            del input_feature_train_df, target_feature_train_df
+
+            input_feature_test_df, target_feature_test_df = self.read_split(test_path)
+            X_test = self.save_features(config.X_test_file_path, preprocessor, input_feature_test_df)
+            y_test = self.save_target(config.y_test_file_path, target_feature_test_df)
 
             logging.info("Preprocessing Pipeline Completed")
 
             save_object(
-                file_path=self.data_transformation_config.preprocessor_obj_file_path,
+                file_path=config.preprocessor_obj_file_path,
                 obj=preprocessor
             )
 
+            self.export_compiled_preprocessor(preprocessor, input_feature_test_df.head(1000))
+
             return (
-                train_arr,
-                test_arr,
-                self.data_transformation_config.preprocessor_obj_file_path
+                X_train,
+                y_train,
+                X_test,
+                y_test,
+                config.preprocessor_obj_file_path
             )
 
         except Exception as e:
             logging.error(f"Error occured at Data Transformation stage: {e}")
-            raise CustomException(e, sys)
\ No newline at end of file
+            raise CustomException(e, sys)
+
+    def iter_frames(self, file_path):
+        import pyarrow.parquet as pq
+
+        parquet_file = pq.ParquetFile(file_path)
+        for batch in parquet_file.iter_batches(batch_size=self.data_transformation_config.chunk_size):
+            yield batch.to_pandas()
+
+    def fit_streaming_preprocessor(self, train_path):
+        '''
+        Fits the preprocessor without loading the train set: one pass keeps a
+        uniform row sample, one exemplar row per category and exact category
+        counts; the pipeline is fitted on sample + exemplars, the categorical
+        fill values are set from the full counts, and a second pass refits
+        both scalers on every row with partial_fit.
+        '''
+        config = self.data_transformation_config
+        rng = np.random.default_rng(config.random_state)
+        sample, sample_keys = None, None
+        counts, exemplars = {}, {}
+
+        for chunk in self.iter_frames(train_path):
+            chunk = chunk.drop(columns=['exam_score'])
+
+            # Keeping the rows with the smallest random keys is a uniform
+            # sample of everything seen so far.
+            keys = rng.random(len(chunk))
+            if sample is not None:
+                keys = np.concatenate([sample_keys, keys])
+                pool = pd.concat([sample, chunk], ignore_index=True)
+            else:
+                pool = chunk.reset_index(drop=True)
+            if len(pool) > config.sample_size:
+                keep = np.argpartition(keys, config.sample_size)[:config.sample_size]
+                pool, keys = pool.iloc[keep].reset_index(drop=True), keys[keep]
+            sample, sample_keys = pool, keys
+
+            for column in chunk.select_dtypes(include=[object, 'category']).columns:
+                value_counts = chunk[column].value_counts(dropna=True)
+                counts[column] = value_counts if column not in counts else counts[column].add(value_counts, fill_value=0)
+                for value in value_counts.index:
+                    if (column, value) not in exemplars:
+                        exemplars[column, value] = chunk.loc[chunk[column] == value].head(1)
+
+        # Rare categories missed by the sample still need an encoder slot.
+        missing = [row for (column, value), row in exemplars.items() if not (sample[column] == value).any()]
+        fit_frame = pd.concat([sample] + missing, ignore_index=True)
+
+        preprocessor = self.get_data_transformer_object()
+        preprocessor.fit(fit_frame)
+        logging.info(f"Preprocessor fitted on a {len(fit_frame)} row sample")
+
+        transformers = {name: (pipe, list(columns)) for name, pipe, columns in preprocessor.transformers_
+                        if name != 'remainder'}
+        cat_pipe, cat_columns = transformers['cat_pipeline']
+        cat_pipe['imputer'].statistics_ = np.array([most_frequent(counts[column]) for column in cat_columns],
+                                                   dtype=object)
+
+        scalers = {name: StandardScaler(**pipe['scaler'].get_params()) for name, (pipe, _) in transformers.items()}
+        for chunk in self.iter_frames(train_path):
+            for name, (pipe, columns) in transformers.items():
+                scalers[name].partial_fit(np.asarray(pipe[:-1].transform(chunk[columns]), dtype=np.float64))
+
+        for name, (pipe, _) in transformers.items():
+            for attr in ('mean_', 'var_', 'scale_', 'n_samples_seen_'):
+                setattr(pipe['scaler'], attr, getattr(scalers[name], attr))
+
+        return preprocessor
+
+    def save_streaming_split(self, preprocessor, file_path, X_file_path, y_file_path):
+        import pyarrow.parquet as pq
+
+        n_rows = pq.ParquetFile(file_path).metadata.num_rows
+        n_features = len(preprocessor.get_feature_names_out())
+        X = open_array(X_file_path, (n_rows, n_features), dtype=self.matrix_dtype())
+        y = open_array(y_file_path, (n_rows,), dtype=self.matrix_dtype())
+
+        start = 0
+        for chunk in self.iter_frames(file_path):
+            target = chunk.pop('exam_score')
+            stop = start + len(chunk)
+            X[start:stop] = np.asarray(preprocessor.transform(chunk), dtype=X.dtype)
+            y[start:stop] = target.to_numpy()
+            start = stop
+
+        X.flush()
+        y.flush()
+        del X, y
+        logging.info(f"Transformed features saved at {X_file_path}")
+        return load_array(X_file_path), load_array(y_file_path)
+
+    def initiate_streaming_transformation(self, train_path, test_path):
+        try:
+            config = self.data_transformation_config
+            logging.info("Streaming Data Transformation Initiated")
+
+            preprocessor = self.fit_streaming_preprocessor(train_path)
+
+            X_train, y_train = self.save_streaming_split(preprocessor, train_path,
+                                                         config.X_train_file_path, config.y_train_file_path)
+            X_test, y_test = self.save_streaming_split(preprocessor, test_path,
+                                                       config.X_test_file_path, config.y_test_file_path)
+
+            save_object(
+                file_path=config.preprocessor_obj_file_path,
+                obj=preprocessor
+            )
+
+            sample = next(self.iter_frames(test_path), None)
+            if sample is not None:
+                sample = sample.drop(columns=['exam_score']).head(1000)
+            self.export_compiled_preprocessor(preprocessor, sample)
+
+            return (
+                X_train,
+                y_train,
+                X_test,
+                y_test,
+                config.preprocessor_obj_file_path
+            )
+
+        except Exception as e:
+            logging.error(f"Error occured at Streaming Data Transformation stage: {e}")
+            raise CustomException(e, sys)
@@ -0,0 +1,18 @@
+import numpy as np
+
+FOCUS_INPUTS = ('study_hours', 'class_attendance', 'sleep_hours')
+FOCUS_FEATURES = ('academic_effort', 'academic_focus_seconds', 'productivity')
+
+
+def add_focus_features(study_hours, class_attendance, sleep_hours, out):
+    '''
+    Writes academic_effort, academic_focus_seconds and productivity into the
+    last axis of `out` in place. Zero attendance gives zero focus seconds
+    instead of inf.
+    '''
+    np.multiply(study_hours, class_attendance, out=out[..., 0])
+    out[..., 1] = 0.0
+    np.divide(study_hours, class_attendance, out=out[..., 1], where=class_attendance != 0)
+    out[..., 1] *= 3600
+    np.multiply(study_hours, sleep_hours, out=out[..., 2])
+    return out
@@ -0,0 +1,59 @@
+import logging
+from src.exception import CustomException
+
+import os
+import sys
+from dataclasses import dataclass, field
+
+@dataclass
+class HardwareProfile:
+    name: str
+    # Constructor overrides per model name, e.g. {'XGBRegressor': {'device': 'cpu'}}.
+    model_params: dict = field(default_factory=dict)
+    # Overrides for the scheduler section of config/training.yaml.
+    scheduler: dict = field(default_factory=dict)
+
+
+def detect_hardware():
+    '''
+    Returns 'gpu' when a CUDA device is usable by both XGBoost and CatBoost,
+    otherwise 'cpu'.
+    '''
+    if os.environ.get('CUDA_VISIBLE_DEVICES', None) in ('', '-1'):
+        return 'cpu'
+
+    try:
+        import xgboost
+        from catboost.utils import get_gpu_device_count
+
+        if xgboost.build_info().get('USE_CUDA') and get_gpu_device_count() > 0:
+            return 'gpu'
+
+    except Exception as e:
+        logging.info(f"GPU detection failed, falling back to cpu: {e}")
+
+    return 'cpu'
+
+
+def load_hardware_profile(hardware_config):
+    try:
+        profiles = hardware_config.get('profiles', {})
+        name = hardware_config.get('profile', 'auto')
+
+        if name == 'auto':
+            name = detect_hardware()
+            logging.info(f"Detected hardware profile: {name}")
+
+        if name not in profiles:
+            raise ValueError(f"Hardware profile '{name}' is not defined in the training config")
+
+        profile = profiles[name] or {}
+        return HardwareProfile(
+            name=name,
+            model_params=profile.get('models', {}) or {},
+            scheduler=profile.get('scheduler', {}) or {},
+        )
+
+    except Exception as e:
+        logging.error(f"Error occured at hardware profile stage: {e}")
+        raise CustomException(e, sys)
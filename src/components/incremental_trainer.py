@@ -0,0 +1,309 @@
+import logging
+from src.exception import CustomException
+
+import os
+import sys
+import copy
+import json
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+from sklearn.base import clone
+from sklearn.metrics import r2_score
+from sklearn.model_selection import train_test_split
+
+from src.utils import save_object, load_object, load_frame, file_sha256
+from src.components.data_ingestion import DataIngestionConfig
+from src.components.data_transformation import DataTransformation, DataTransformationConfig, most_frequent
+from src.components.model_trainer import ModelTrainer
+from src.components.compiled_preprocessor import export_compiled_preprocessor
+from src.components.compiled_ensemble import check_hist_gradient_boosting_internals
+from src.components.artifact_store import ArtifactStore
+from src.metrics import histogram
+
+TRAINING_STAGE_SECONDS = histogram('training_stage_seconds', 'Wall clock time of each training stage', ['stage'])
+
+TARGET_COLUMN = 'exam_score'
+
+
+@dataclass
+class IncrementalTrainerConfig:
+    # Batches already folded into the served model, by content hash.
+    state_file_path: str = os.path.join('artifacts', 'incremental_state.json')
+    # Trees added to a boosted model per update.
+    n_estimators: int = 50
+    # Share of the new rows held out to validate the updated model on.
+    validation_size: float = 0.2
+    # Random rows of the train split boosted on together with the new rows,
+    # so a small batch does not pull the whole ensemble towards itself. The
+    # imputer fill values are recomputed on the same rows.
+    replay_rows: int = 10_000
+    # Rows of the test split the current and updated models are compared on.
+    reference_rows: int = 50_000
+    # The update is promoted only if r2 drops by at most this much on both
+    # the test split and the held-out new rows. Some slack is needed: extra
+    # trees fitted on a replay sample move the test score by noise alone.
+    max_r2_drop: float = 0.01
+    # Same floor the full training run applies to its best model.
+    min_r2: float = 0.6
+    min_new_rows: int = 50
+    random_state: int = 42
+
+
+def refresh_imputers(preprocessor, frame):
+    '''
+    Recomputes the fill values of the fitted imputers on `frame`. Scalers
+    and the encoder are left alone: the model was trained in their feature
+    space, and moving it would shift every learned split and coefficient.
+    '''
+    for name, pipe, columns in preprocessor.transformers_:
+        if name == 'remainder' or 'imputer' not in pipe.named_steps:
+            continue
+        imputer = pipe['imputer']
+        values = frame[list(columns)]
+        statistics = imputer.statistics_.copy()
+
+        for i, column in enumerate(values.columns):
+            if imputer.strategy == 'median':
+                column_values = values[column].to_numpy(dtype=np.float64)
+                if not np.isnan(column_values).all():
+                    statistics[i] = np.nanmedian(column_values)
+            elif imputer.strategy == 'most_frequent':
+                counts = values[column].value_counts(dropna=True)
+                if len(counts) > 0:
+                    statistics[i] = most_frequent(counts)
+        imputer.statistics_ = statistics
+    return preprocessor
+
+
+def supports_continuation(model):
+    library = type(model).__module__.split('.')[0]
+    return library in ('xgboost', 'catboost') or hasattr(model, 'warm_start')
+
+
+def continue_boosting(model, X, y, n_estimators):
+    '''
+    Returns a copy of `model` with n_estimators more trees fitted on (X, y)
+    on top of the existing ones; `model` itself is left untouched.
+    '''
+    library = type(model).__module__.split('.')[0]
+
+    if library == 'xgboost':
+        updated = clone(model).set_params(n_estimators=n_estimators)
+        updated.fit(X, y, xgb_model=model.get_booster())
+        return updated
+
+    if library == 'catboost':
+        updated = clone(model).set_params(iterations=n_estimators)
+        updated.fit(X, y, init_model=model)
+        return updated
+
+    if hasattr(model, 'warm_start'):
+        # HistGradientBoosting keeps its trees and fits max_iter - n_iter_ new
+        # ones. fit() would re-bin X with a freshly fitted bin mapper, while
+        # the existing trees split on the bin codes of the original one, so
+        # the original mapper is kept for the new rows too.
+        check_hist_gradient_boosting_internals(model, continuation=True)
+        updated = copy.deepcopy(model)
+        bin_mapper = updated._bin_mapper
+
+        def bin_data(X, is_training_data):
+            updated._bin_mapper = bin_mapper
+            X_binned = bin_mapper.transform(X)
+            return X_binned if is_training_data else np.ascontiguousarray(X_binned)
+
+        updated._bin_data = bin_data
+        try:
+            updated.set_params(warm_start=True, early_stopping=False, max_iter=model.n_iter_ + n_estimators)
+            updated.fit(X, y)
+        finally:
+            del updated._bin_data
+        return updated.set_params(warm_start=False)
+
+    raise ValueError(f"{type(model).__name__} cannot continue training from its fitted state")
+
+
+class IncrementalTrainer:
+    '''
+    Folds batches of new labelled rows into the served model without a
+    model search: the imputers are refreshed, boosted models grow more
+    trees from their current ensemble, and other models are refitted on
+    the train split plus the new rows. The result replaces the served
+    artifacts only if validation r2 holds.
+    '''
+    def __init__(self, config=None, low_memory=False):
+        self.incremental_config = config or IncrementalTrainerConfig()
+        self.ingestion_config = DataIngestionConfig()
+        self.data_transformation = DataTransformation(DataTransformationConfig(low_memory=low_memory))
+        self.model_trainer = ModelTrainer()
+
+    def _read_state(self):
+        if not os.path.isfile(self.incremental_config.state_file_path):
+            return {'batches': {}}
+        with open(self.incremental_config.state_file_path) as file_obj:
+            return json.load(file_obj)
+
+    def _write_state(self, state):
+        file_path = self.incremental_config.state_file_path
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        with open(f"{file_path}.tmp", 'w') as file_obj:
+            json.dump(state, file_obj, indent=2)
+        os.replace(f"{file_path}.tmp", file_path)
+
+    def read_batches(self, paths, feature_columns):
+        '''
+        Labelled rows of the batches not yet folded into the model. The
+        audit log stores predictions under exam_score, so its files must
+        have the observed scores joined in before they are passed here.
+        '''
+        consumed = self._read_state()['batches']
+        frames, batches = [], {}
+        for path in paths:
+            digest = file_sha256(path)
+            if digest in consumed:
+                logging.info(f"Skipping {path}, already folded into the model")
+                continue
+
+            frame = load_frame(path)
+            missing = [column for column in [*feature_columns, TARGET_COLUMN] if column not in frame.columns]
+            if missing:
+                raise ValueError(f"{path} is missing columns {missing}")
+            frame = frame.loc[frame[TARGET_COLUMN].notna(), [*feature_columns, TARGET_COLUMN]]
+            frames.append(frame)
+            batches[digest] = {'path': path, 'rows': len(frame)}
+
+        if not frames:
+            return None, batches
+        return pd.concat(frames, ignore_index=True), batches
+
+    def _sample(self, file_path, n_rows, feature_columns):
+        if not os.path.isfile(file_path):
+            return None
+        frame = load_frame(file_path, columns=[*feature_columns, TARGET_COLUMN])
+        if n_rows is not None and len(frame) > n_rows:
+            frame = frame.sample(n=n_rows, random_state=self.incremental_config.random_state)
+        return frame
+
+    def _matrix(self, preprocessor, frame):
+        dtype = self.data_transformation.matrix_dtype()
+        return np.asarray(preprocessor.transform(frame.drop(columns=[TARGET_COLUMN])), dtype=dtype)
+
+    def _validate(self, current, candidate, validation_sets):
+        config = self.incremental_config
+        scores = {}
+        for name, frame in validation_sets.items():
+            if frame is None or len(frame) < 2:
+                continue
+            y_true = frame[TARGET_COLUMN].to_numpy(dtype=np.float64)
+            scores[name] = {
+                'current_r2': float(r2_score(y_true, current[0].predict(self._matrix(current[1], frame)))),
+                'candidate_r2': float(r2_score(y_true, candidate[0].predict(self._matrix(candidate[1], frame)))),
+            }
+            logging.info(f"Incremental update r2 on {name}: {scores[name]}")
+
+        holds = all(score['candidate_r2'] >= score['current_r2'] - config.max_r2_drop for score in scores.values())
+        holds = holds and all(score['candidate_r2'] >= config.min_r2 for score in scores.values())
+        return bool(scores) and holds, scores
+
+    def _promote(self, model, preprocessor, sample, compile_config):
+        '''
+        Publishes to the artifact store first and only then swaps model.pkl,
+        preprocessor.pkl and the compiled preprocessor into place, so a
+        failure never leaves a model next to a preprocessor it was not
+        trained with.
+        '''
+        model_path = self.model_trainer.model_trainer_config.trained_model_file_path
+        transformation_config = self.data_transformation.data_transformation_config
+        preprocessor_path = transformation_config.preprocessor_obj_file_path
+        compiled_path = transformation_config.compiled_preprocessor_file_path
+        staged = {path: f"{path}.tmp.{os.getpid()}" for path in (model_path, preprocessor_path, compiled_path)}
+        try:
+            save_object(file_path=staged[preprocessor_path], obj=preprocessor)
+            try:
+                compiled_preprocessor = export_compiled_preprocessor(
+                    preprocessor, staged[compiled_path], sample=sample.drop(columns=[TARGET_COLUMN]).head(1000))
+            except CustomException:
+                logging.error("Compiled preprocessor export failed, serving will use the sklearn preprocessor")
+                compiled_preprocessor = None
+
+            compiled_model = self.model_trainer.compile_model(model, self._matrix(preprocessor, sample),
+                                                              compile_config)
+            version = ArtifactStore().publish(model, staged[preprocessor_path], compiled_preprocessor, compiled_model)
+
+            save_object(file_path=staged[model_path], obj=model)
+            for path, staged_path in staged.items():
+                if os.path.isfile(staged_path):
+                    os.replace(staged_path, path)
+                elif os.path.isfile(path):
+                    # A stale compiled kernel must not outlive the preprocessor it was built from.
+                    os.remove(path)
+            return version
+
+        finally:
+            for staged_path in staged.values():
+                if os.path.isfile(staged_path):
+                    os.remove(staged_path)
+
+    def initiate_incremental_training(self, paths, compile_config=None):
+        try:
+            config = self.incremental_config
+            model_path = self.model_trainer.model_trainer_config.trained_model_file_path
+            preprocessor_path = self.data_transformation.data_transformation_config.preprocessor_obj_file_path
+
+            model = load_object(model_path)
+            preprocessor = load_object(preprocessor_path)
+            feature_columns = list(preprocessor.feature_names_in_)
+            model_name = type(model).__name__
+
+            new_rows, batches = self.read_batches(paths, feature_columns)
+            n_new = 0 if new_rows is None else len(new_rows)
+            result = {'model': model_name, 'new_rows': n_new, 'promoted': False}
+            if n_new < config.min_new_rows:
+                logging.info(f"Incremental training skipped, {n_new} new labelled rows (minimum {config.min_new_rows})")
+                return result
+
+            with TRAINING_STAGE_SECONDS.time(stage='incremental_train'):
+                new_train, new_validation = train_test_split(new_rows, test_size=config.validation_size,
+                                                             random_state=config.random_state)
+
+                # Models without a continuation path are refitted on the whole train split.
+                continues = supports_continuation(model)
+                replay = self._sample(self.ingestion_config.train_data_path,
+                                      config.replay_rows if continues else None, feature_columns)
+                fit_frame = pd.concat([frame for frame in (replay, new_train) if frame is not None], ignore_index=True)
+
+                candidate_preprocessor = refresh_imputers(copy.deepcopy(preprocessor), fit_frame)
+
+                X_fit = self._matrix(candidate_preprocessor, fit_frame)
+                y_fit = fit_frame[TARGET_COLUMN].to_numpy(dtype=X_fit.dtype)
+                if continues:
+                    logging.info(f"Adding {config.n_estimators} trees to {model_name} on {len(X_fit)} rows "
+                                 f"({len(new_train)} new)")
+                    candidate = continue_boosting(model, X_fit, y_fit, config.n_estimators)
+                else:
+                    logging.info(f"Refitting {model_name} on {len(X_fit)} rows ({len(new_train)} new)")
+                    candidate = clone(model).fit(X_fit, y_fit)
+
+            reference = self._sample(self.ingestion_config.test_data_path, config.reference_rows, feature_columns)
+            promoted, scores = self._validate((model, preprocessor), (candidate, candidate_preprocessor),
+                                              {'test_split': reference, 'new_rows': new_validation})
+            result.update({'promoted': promoted, 'scores': scores})
+            if not promoted:
+                # The rows stay pending and are retried together with the next batches.
+                logging.info(f"Incremental update of {model_name} rejected, validation r2 dropped by more than "
+                             f"{config.max_r2_drop} or fell below {config.min_r2}: {scores}")
+                return result
+
+            sample = reference if reference is not None else new_validation
+            result['version'] = self._promote(candidate, candidate_preprocessor, sample, compile_config)
+
+            state = self._read_state()
+            state['batches'].update(batches)
+            self._write_state(state)
+            logging.info(f"Incremental update of {model_name} promoted as version {result['version']}")
+            return result
+
+        except Exception as e:
+            logging.error(f"Error occured at incremental training stage: {e}")
+            raise CustomException(e, sys)
@@ -0,0 +1,97 @@
+import logging
+from src.exception import CustomException
+
+import os
+import sys
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass
+
+from src.metrics import histogram
+
+BATCH_SIZE = histogram('micro_batch_size', 'Records coalesced into one micro-batch',
+                       buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256))
+QUEUE_WAIT_SECONDS = histogram('micro_batch_queue_wait_seconds', 'Time a record waits before its batch runs')
+
+@dataclass
+class MicroBatcherConfig:
+    max_batch_size: int = 64
+    max_wait_ms: float = 5.0
+    result_timeout: float = 30.0
+
+
+class MicroBatcher:
+    '''
+    Coalesces records submitted concurrently from request threads into one
+    call of predict_fn(records), which must return one prediction per record.
+    '''
+    def __init__(self, predict_fn, config=None):
+        self.predict_fn = predict_fn
+        self.batcher_config = config or MicroBatcherConfig()
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def _ensure_started(self):
+        # Threads do not survive fork(), so every worker process starts its own.
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid():
+                self._queue = queue.Queue()
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+                self._thread.start()
+
+    def start(self):
+        self._ensure_started()
+        return self
+
+    def submit(self, record):
+        self._ensure_started()
+        future = Future()
+        future.submitted_at = time.perf_counter()
+        self._queue.put((record, future))
+        return future
+
+    def predict(self, record):
+        return self.submit(record).result(timeout=self.batcher_config.result_timeout)
+
+    def _collect_batch(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.batcher_config.max_wait_ms / 1000.0
+
+        while len(batch) < self.batcher_config.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+
+        BATCH_SIZE.observe(len(batch))
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+            records = [record for record, _ in batch]
+            futures = [future for _, future in batch]
+            now = time.perf_counter()
+            for future in futures:
+                QUEUE_WAIT_SECONDS.observe(now - future.submitted_at)
+
+            try:
+                preds = self.predict_fn(records)
+                for future, pred in zip(futures, preds):
+                    future.set_result(pred)
+
+            except Exception as e:
+                logging.error(f"Error occured at micro batcher stage: {e}")
+                error = e if isinstance(e, CustomException) else CustomException(e, sys)
+                for future in futures:
+                    future.set_exception(error)
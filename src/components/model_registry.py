@@ -0,0 +1,217 @@
+import logging
+from src.exception import CustomException
+
+import os
+import sys
+import hashlib
+import threading
+import time
+from dataclasses import dataclass
+
+from src.serving_utils import load_object, file_sha256
+from src.components.compiled_preprocessor import CompiledPreprocessor, model_input_dtype
+from src.components.artifact_store import ArtifactStore, ArtifactStoreConfig
+from src.metrics import counter, histogram
+
+ARTIFACT_LOAD_SECONDS = histogram('model_registry_load_seconds', 'Time to load each serving artifact', ['artifact'])
+MODEL_RELOADS = counter('model_registry_reloads_total', 'Artifact loads by the model registry, by outcome', ['outcome'])
+
+@dataclass
+class ModelRegistryConfig:
+    preprocessor_path: str = os.path.join('artifacts', 'preprocessor.pkl')
+    model_path: str = os.path.join('artifacts', 'model.pkl')
+    # Optional NumPy kernel exported next to preprocessor.pkl; used when present.
+    compiled_preprocessor_path: str = os.path.join('artifacts', 'preprocessor_compiled.npz')
+    # Native artifact store; preferred over the pickles above once published.
+    artifact_store_dir: str = os.path.join('artifacts', 'model_store')
+    # Node visits (rows x trees x depth) up to which a call is served by the
+    # compiled ensemble; larger batches go to the library's native kernels.
+    compiled_model_max_steps: int = 50_000
+    # Seconds between stat() checks of the artifact files, so the hot path
+    # never touches the filesystem more than once per interval.
+    reload_check_interval: float = 2.0
+    # Threads for the native model's predict call; 0 keeps the library
+    # default of one per core. Multi-process callers such as bulk scoring
+    # set 1 so that the processes do not oversubscribe the cores.
+    predict_threads: int = 0
+
+
+@dataclass(frozen=True)
+class LoadedModel:
+    preprocessor: object
+    model: object
+    version: str
+    compiled_preprocessor: object = None
+    input_dtype: object = None
+    compiled_model: object = None
+    compiled_max_rows: int = 0
+    predict_kwargs: dict = None
+
+    def predict(self, X):
+        if self.compiled_model is not None and len(X) <= self.compiled_max_rows:
+            return self.compiled_model.predict(X)
+        return self.model.predict(X, **(self.predict_kwargs or {}))
+
+
+def limit_predict_threads(model, library, n_threads):
+    '''
+    Caps the threads the native model uses to predict and returns the extra
+    keyword arguments its predict() needs for that. XGBoost takes n_jobs as
+    a parameter, a fitted CatBoost model only per call; sklearn models run
+    on OpenMP/BLAS pools, which callers cap with threadpool_limits.
+    '''
+    if not n_threads:
+        return {}
+    if library == 'xgboost':
+        model.set_params(n_jobs=n_threads)
+    if library == 'catboost':
+        return {'thread_count': n_threads}
+    return {}
+
+
+class ModelRegistry:
+    '''
+    Keeps one preprocessor/model pair in memory per process and reloads it
+    when the artifact files on disk change.
+    '''
+    def __init__(self, config=None):
+        self.registry_config = config or ModelRegistryConfig()
+        self._lock = threading.Lock()
+        self._loaded = None
+        self._stat_signature = None
+        self._last_check = 0.0
+        self._store = ArtifactStore(ArtifactStoreConfig(root_dir=self.registry_config.artifact_store_dir))
+
+    def _use_store(self):
+        return os.path.isfile(self._store.current_path)
+
+    def _artifact_paths(self):
+        if self._use_store():
+            # Published version directories are immutable; CURRENT is swapped atomically.
+            return [self._store.current_path]
+        paths = [self.registry_config.preprocessor_path, self.registry_config.model_path]
+        if os.path.isfile(self.registry_config.compiled_preprocessor_path):
+            paths.append(self.registry_config.compiled_preprocessor_path)
+        return paths
+
+    def _current_stat_signature(self):
+        signature = []
+        for path in self._artifact_paths():
+            stat = os.stat(path)
+            signature.append((path, stat.st_ino, stat.st_size, stat.st_mtime_ns))
+        return tuple(signature)
+
+    def _content_version(self):
+        if self._use_store():
+            version = self._store.current_version()
+            if version is None:
+                raise FileNotFoundError(self._store.current_path)
+            return version
+
+        digest = hashlib.sha256()
+        for path in self._artifact_paths():
+            digest.update(file_sha256(path).encode())
+        return digest.hexdigest()[:16]
+
+    def _load_from_store(self, version):
+        with ARTIFACT_LOAD_SECONDS.time(artifact='store'):
+            model, preprocessor, compiled_preprocessor, compiled_model, manifest = self._store.load(version)
+        predict_kwargs = limit_predict_threads(model, manifest['model']['library'],
+                                               self.registry_config.predict_threads)
+
+        if compiled_model is None:
+            logging.info(f"Model registry loaded artifact store version {version} ({manifest['model']['kind']} model)")
+            return LoadedModel(preprocessor=preprocessor, model=model, version=version,
+                               compiled_preprocessor=compiled_preprocessor, input_dtype=model_input_dtype(model),
+                               predict_kwargs=predict_kwargs)
+
+        steps_per_row = max(1, compiled_model.n_trees * compiled_model.max_depth)
+        compiled_max_rows = max(1, self.registry_config.compiled_model_max_steps // steps_per_row)
+        logging.info(f"Model registry loaded artifact store version {version} with a compiled "
+                     f"{compiled_model.n_trees}-tree ensemble for batches up to {compiled_max_rows} rows")
+        return LoadedModel(preprocessor=preprocessor, model=model, version=version,
+                           compiled_preprocessor=compiled_preprocessor, input_dtype=compiled_model.input_dtype,
+                           compiled_model=compiled_model, compiled_max_rows=compiled_max_rows,
+                           predict_kwargs=predict_kwargs)
+
+    def _load(self, version):
+        if self._use_store():
+            return self._load_from_store(version)
+
+        with ARTIFACT_LOAD_SECONDS.time(artifact='preprocessor'):
+            preprocessor = load_object(self.registry_config.preprocessor_path)
+        with ARTIFACT_LOAD_SECONDS.time(artifact='model'):
+            model = load_object(self.registry_config.model_path)
+
+        compiled_preprocessor = None
+        if os.path.isfile(self.registry_config.compiled_preprocessor_path):
+            with ARTIFACT_LOAD_SECONDS.time(artifact='compiled_preprocessor'):
+                compiled_preprocessor = CompiledPreprocessor.load(self.registry_config.compiled_preprocessor_path)
+
+        predict_kwargs = limit_predict_threads(model, type(model).__module__.split('.')[0],
+                                               self.registry_config.predict_threads)
+        logging.info(f"Model registry loaded artifacts version {version}")
+        return LoadedModel(preprocessor=preprocessor, model=model, version=version,
+                           compiled_preprocessor=compiled_preprocessor, input_dtype=model_input_dtype(model),
+                           predict_kwargs=predict_kwargs)
+
+    def _refresh(self):
+        signature = self._current_stat_signature()
+        if self._loaded is not None and signature == self._stat_signature:
+            return
+
+        version = self._content_version()
+        if self._loaded is None or version != self._loaded.version:
+            try:
+                self._loaded = self._load(version)
+                MODEL_RELOADS.inc(outcome='loaded')
+            except Exception:
+                MODEL_RELOADS.inc(outcome='failed')
+                # A half-written artifact must not take serving down while an
+                # older pair is still available; retry on the next check.
+                if self._loaded is None:
+                    raise
+                logging.error(f"Model registry reload of version {version} failed, keeping {self._loaded.version}")
+                return
+
+        self._stat_signature = signature
+
+    def get(self):
+        loaded = self._loaded
+        now = time.monotonic()
+        if loaded is not None and now - self._last_check < self.registry_config.reload_check_interval:
+            return loaded
+
+        try:
+            with self._lock:
+                if self._loaded is None or time.monotonic() - self._last_check >= self.registry_config.reload_check_interval:
+                    try:
+                        self._refresh()
+                    except FileNotFoundError:
+                        if self._loaded is None:
+                            raise
+                        logging.error("Model registry artifacts missing, keeping the loaded version")
+                    self._last_check = time.monotonic()
+                return self._loaded
+
+        except Exception as e:
+            logging.error(f"Error occured at model registry stage: {e}")
+            raise CustomException(e, sys)
+
+    def reload(self):
+        with self._lock:
+            self._stat_signature = None
+            self._last_check = 0.0
+        return self.get()
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+def get_model_registry():
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = ModelRegistry()
+    return _registry
@@ -1,11 +1,16 @@
 import logging
-import src.logger
 from src.exception import CustomException
 import os
 import sys
 
 from dataclasses import dataclass
 from src.utils import save_object, evaluate_models
+from src.components.training_scheduler import TrainingSchedulerConfig
+from src.components.hardware_profile import load_hardware_profile
+from src.components.compiled_preprocessor import CompiledPreprocessor
+from src.components.compiled_ensemble import export_compiled_ensemble
+from src.components.artifact_store import ArtifactStore
+from src.metrics import histogram
 
 import numpy as np
 import pandas as pd
@@ -14,38 +19,127 @@ from sklearn.ensemble import HistGradientBoostingRegressor
 import yaml
 from sklearn.tree import DecisionTreeRegressor
 from sklearn.linear_model import LinearRegression
+import xgboost
 from xgboost import XGBRegressor
 from catboost import CatBoostRegressor
 
+TRAINING_STAGE_SECONDS = histogram('training_stage_seconds', 'Wall clock time of each training stage', ['stage'])
+
 @dataclass
 class ModelTrainerConfig:
     trained_model_file_path = os.path.join("artifacts", "model.pkl")
+    compiled_preprocessor_file_path = os.path.join("artifacts", "preprocessor_compiled.npz")
+    # Page cache of XGBoost external-memory training.
+    external_memory_dir = os.path.join("artifacts", "xgb_cache")
+
+
+class ArrayChunkIter(xgboost.DataIter):
+    '''
+    Feeds XGBoost one row block of the memory-mapped matrices at a time, so
+    only the current block and XGBoost's own compressed pages are resident.
+    '''
+    def __init__(self, X, y, chunk_size, cache_prefix):
+        self.X = X
+        self.y = y
+        self.chunk_size = chunk_size
+        self._start = 0
+        super().__init__(cache_prefix=cache_prefix)
+
+    def next(self, input_data):
+        if self._start >= len(self.X):
+            return False
+        stop = self._start + self.chunk_size
+        input_data(data=np.asarray(self.X[self._start:stop]), label=np.asarray(self.y[self._start:stop]))
+        self._start = stop
+        return True
+
+    def reset(self):
+        self._start = 0
+
+
+def streaming_r2_score(model, X, y, chunk_size):
+    '''
+    r2 from running sums over row blocks, so the test set and its
+    predictions are never materialized whole.
+    '''
+    n, total, total_sq, sse = 0, 0.0, 0.0, 0.0
+    for start in range(0, len(y), chunk_size):
+        y_true = np.asarray(y[start:start + chunk_size], dtype=np.float64)
+        y_pred = np.asarray(model.predict(X[start:start + chunk_size]), dtype=np.float64)
+        n += len(y_true)
+        total += y_true.sum()
+        total_sq += np.square(y_true).sum()
+        sse += np.square(y_true - y_pred).sum()
+    return 1.0 - sse / (total_sq - total * total / n)
 
 class ModelTrainer:
     def __init__(self):
         self.model_trainer_config = ModelTrainerConfig()
 
-    def initiate_model_trainer(self, train_array, test_array, preprocessor_path):
+    def build_models(self, profile):
+        def profile_params(model_name):
+            return profile.model_params.get(model_name, {})
+
+        return {
+            "Hist Gradient Boosting": HistGradientBoostingRegressor(**profile_params("Hist Gradient Boosting")),
+            "Linear Regression": LinearRegression(n_jobs=-1, **profile_params("Linear Regression")),
+            "XGBRegressor": XGBRegressor(n_jobs=-1, **profile_params("XGBRegressor")),
+            "CatBoost Regressor": CatBoostRegressor(verbose=False, thread_count=-1, **profile_params("CatBoost Regressor")),
+        }
+
+    def compile_model(self, model, sample, compile_config=None):
+        '''
+        Flattens a tree ensemble for the serving tier, verified on `sample`
+        (transformed test rows). Serving falls back to the native model
+        when this returns None.
+        '''
+        compile_config = compile_config or {}
+        if sample is None or not compile_config.get('enabled', True):
+            return None
         try:
-            X_train, y_train, X_test, y_test = (
-                train_array[:, :-1],
-                train_array[:, -1],
-                test_array[:, :-1],
-                test_array[:, -1],
+            with TRAINING_STAGE_SECONDS.time(stage='compile_model'):
+                return export_compiled_ensemble(model, np.asarray(sample[:compile_config.get('verify_rows', 2000)]),
+                                                prune_tolerance=compile_config.get('prune_tolerance', 0.0))
+        except CustomException as e:
+            logging.error(f"Serving the native model, compiling it failed: {e}")
+            return None
+
+    def save_model(self, model, preprocessor_path, sample=None, compile_config=None):
+        '''
+        Keeps model.pkl for tools that read it and publishes the model with
+        its preprocessors, and its compiled version when it is a tree
+        ensemble, to the native artifact store that serving loads.
+        '''
+        config = self.model_trainer_config
+        compiled_model = self.compile_model(model, sample, compile_config)
+        with TRAINING_STAGE_SECONDS.time(stage='save_model'):
+            save_object(
+                file_path=config.trained_model_file_path,
+                obj=model
             )
 
-            models = {
-                "Hist Gradient Boosting": HistGradientBoostingRegressor(),
-                "Linear Regression": LinearRegression(n_jobs=-1),
-                "XGBRegressor": XGBRegressor(n_jobs=-1, device='cuda', tree_method='hist'),
-                "CatBoost Regressor": CatBoostRegressor(verbose=False, thread_count=-1, task_type="GPU", devices='0'),
-            }
+            compiled_preprocessor = None
+            if os.path.isfile(config.compiled_preprocessor_file_path):
+                compiled_preprocessor = CompiledPreprocessor.load(config.compiled_preprocessor_file_path)
+            return ArtifactStore().publish(model, preprocessor_path, compiled_preprocessor, compiled_model)
+
+    def initiate_model_trainer(self, X_train, y_train, X_test, y_test, preprocessor_path):
+        try:
+            with open("config/training.yaml", "r") as file:
+                training_config = yaml.safe_load(file) or {}
+
+            profile = load_hardware_profile(training_config.get('hardware', {}))
+            logging.info(f"Training with hardware profile: {profile.name}")
+
+            models = self.build_models(profile)
 
             with open("config/params.yaml", "r") as file:
                 all_params = yaml.safe_load(file)
 
+            scheduler_config = TrainingSchedulerConfig(**{**training_config.get('scheduler', {}), **profile.scheduler})
+
             model_report:dict = evaluate_models(X_train=X_train, y_train=y_train, X_test=X_test, y_test=y_test,
-                                                models=models, params=all_params)
+                                                models=models, params=all_params, config=scheduler_config)
 
             best_model_name = max(model_report, key=lambda x: model_report[x]['best_score'])
             best_model = model_report[best_model_name]['best_model']
@@ -58,14 +152,66 @@ class ModelTrainer:
             logging.info(f"Best model found: {best_model_name} with r2_score: {best_model_score}")
             logging.info(f"is tuned better: {model_report[best_model_name]['is_tuned_better']}")
 
-            save_object(
-                file_path=self.model_trainer_config.trained_model_file_path,
-                obj=best_model
-            )
+            self.save_model(best_model, preprocessor_path, sample=X_test,
+                            compile_config=training_config.get('compiled_model', {}))
 
             return best_model_name, best_model_score
 
         except Exception as e:
             logging.error(f"Error occured at model trainer stage: {e}")
             raise CustomException(e, sys)
-        
\ No newline at end of file
+        
+    def initiate_streaming_model_trainer(self, X_train, y_train, X_test, y_test, preprocessor_path):
+        '''
+        Out-of-core variant: trains a single XGBoost model with external
+        memory from the memory-mapped matrices instead of searching every
+        model on in-memory copies.
+        '''
+        try:
+            with open("config/training.yaml", "r") as file:
+                training_config = yaml.safe_load(file) or {}
+
+            out_of_core_config = training_config.get('out_of_core', {}) or {}
+            chunk_size = out_of_core_config.get('chunk_size', 100_000)
+
+            profile = load_hardware_profile(training_config.get('hardware', {}))
+            params = {
+                'objective': 'reg:squarederror',
+                'tree_method': 'hist',
+                **profile.model_params.get("XGBRegressor", {}),
+                **out_of_core_config.get('params', {}),
+            }
+            logging.info(f"Out-of-core training with hardware profile {profile.name} and params {params}")
+
+            cache_dir = self.model_trainer_config.external_memory_dir
+            os.makedirs(cache_dir, exist_ok=True)
+            train_iter = ArrayChunkIter(X_train, y_train, chunk_size, cache_prefix=os.path.join(cache_dir, "train"))
+            if hasattr(xgboost, 'ExtMemQuantileDMatrix'):
+                dtrain = xgboost.ExtMemQuantileDMatrix(train_iter, max_bin=params.get('max_bin', 256))
+            else:
+                dtrain = xgboost.DMatrix(train_iter)
+
+            with TRAINING_STAGE_SECONDS.time(stage='external_memory_train'):
+                booster = xgboost.train(params, dtrain, num_boost_round=out_of_core_config.get('num_boost_round', 300))
+            del dtrain
+
+            # Hand serving the same estimator type the in-memory path produces.
+            best_model = XGBRegressor()
+            best_model.load_model(bytearray(booster.save_raw(raw_format='ubj')))
+
+            best_model_name = "XGBRegressor"
+            best_model_score = streaming_r2_score(best_model, X_test, y_test, chunk_size)
+
+            if best_model_score < 0.6:
+                raise CustomException("No best model found with r2_score greater than the threshold 0.6", sys)
+
+            logging.info(f"Out-of-core model trained: {best_model_name} with r2_score: {best_model_score}")
+
+            self.save_model(best_model, preprocessor_path, sample=X_test,
+                            compile_config=training_config.get('compiled_model', {}))
+
+            return best_model_name, best_model_score
+
+        except Exception as e:
+            logging.error(f"Error occured at out-of-core model trainer stage: {e}")
+            raise CustomException(e, sys)
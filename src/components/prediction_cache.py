@@ -0,0 +1,209 @@
+import logging
+
+import os
+import json
+import math
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from src.metrics import counter
+
+CACHE_LOOKUPS = counter('prediction_cache_lookups_total', 'Prediction cache lookups by result', ['result'])
+
+@dataclass
+class PredictionCacheConfig:
+    max_entries: int = 10_000
+    ttl_seconds: float = 3600.0
+    # Optional SQLite file shared by every worker process on the host;
+    # empty keeps the cache in-process only.
+    shared_path: str = os.environ.get('PREDICTION_CACHE_DB', '')
+    # Expired rows are purged from the shared file every this many writes.
+    shared_purge_every: int = 1000
+    # Feature columns the prediction depends on; `id` is dropped by the
+    # preprocessor and would make every key unique.
+    key_columns: tuple = ('age', 'gender', 'course', 'study_hours', 'class_attendance', 'internet_access',
+                          'sleep_hours', 'sleep_quality', 'study_method', 'facility_rating', 'exam_difficulty')
+    numeric_columns: tuple = ('age', 'study_hours', 'class_attendance', 'sleep_hours')
+
+
+def _canonical(value, numeric):
+    # 20, 20.0 and np.float32(20) are the same numeric feature; categories
+    # are compared as the strings the encoder sees.
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return None
+    if not numeric:
+        return str(value)
+    value = float(value)
+    return None if math.isnan(value) else value
+
+
+class PredictionCache:
+    '''
+    LRU + TTL cache of single-record predictions keyed on the canonicalized
+    feature values. Entries belong to one model registry version and are
+    dropped as soon as a different version is looked up.
+    '''
+    def __init__(self, config=None):
+        self.cache_config = config or PredictionCacheConfig()
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._version = None
+        self._local = threading.local()
+        self._shared_writes = 0
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def make_key(self, record):
+        numeric = self.cache_config.numeric_columns
+        return json.dumps([_canonical(record.get(column), column in numeric) for column in self.cache_config.key_columns],
+                          separators=(',', ':'))
+
+    def _connection(self):
+        # sqlite3 connections are per thread and must not cross a fork().
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.cache_config.shared_path, timeout=1.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")
+            conn.execute("CREATE TABLE IF NOT EXISTS predictions "
+                         "(version TEXT, key TEXT, value REAL, expires_at REAL, PRIMARY KEY (version, key))")
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def _switch_version(self, version):
+        self._entries.clear()
+        self._version = version
+        if self.cache_config.shared_path:
+            try:
+                self._connection().execute("DELETE FROM predictions WHERE version != ?", (version,))
+            except sqlite3.Error as e:
+                logging.error(f"Prediction cache could not purge old versions: {e}")
+        logging.info(f"Prediction cache switched to model version {version}")
+
+    def _shared_get(self, version, keys):
+        if not keys or not self.cache_config.shared_path:
+            return {}
+        try:
+            found, now = {}, time.time()
+            # Stay under SQLite's bound-parameter limit on large batches.
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                placeholders = ','.join('?' * len(batch))
+                found.update(self._connection().execute(
+                    f"SELECT key, value FROM predictions WHERE version = ? AND expires_at > ? AND key IN ({placeholders})",
+                    (version, now, *batch),
+                ).fetchall())
+            return found
+        except sqlite3.Error as e:
+            # The shared tier is an optimization; a locked or broken file just misses.
+            logging.error(f"Prediction cache shared lookup failed: {e}")
+            return {}
+
+    def _shared_put(self, version, items):
+        if not items or not self.cache_config.shared_path:
+            return
+        try:
+            conn = self._connection()
+            expires_at = time.time() + self.cache_config.ttl_seconds
+            conn.executemany("INSERT OR REPLACE INTO predictions VALUES (?, ?, ?, ?)",
+                             [(version, key, value, expires_at) for key, value in items])
+            self._shared_writes += len(items)
+            if self._shared_writes >= self.cache_config.shared_purge_every:
+                self._shared_writes = 0
+                conn.execute("DELETE FROM predictions WHERE expires_at <= ?", (time.time(),))
+        except sqlite3.Error as e:
+            logging.error(f"Prediction cache shared write failed: {e}")
+
+    def lookup(self, version, records):
+        '''
+        Returns (keys, values) with one entry per record; values are None
+        where the prediction still has to be computed.
+        '''
+        keys = [self.make_key(record) for record in records]
+        values = [None] * len(keys)
+        now = time.monotonic()
+
+        with self._lock:
+            if version != self._version:
+                self._switch_version(version)
+            for i, key in enumerate(keys):
+                entry = self._entries.get(key)
+                if entry is None:
+                    continue
+                if entry[1] <= now:
+                    del self._entries[key]
+                    continue
+                self._entries.move_to_end(key)
+                values[i] = entry[0]
+                self.hits += 1
+
+        missing = [key for key, value in zip(keys, values) if value is None]
+        shared = self._shared_get(version, missing)
+        if shared:
+            self._put_local(version, shared.items())
+
+        for i, key in enumerate(keys):
+            if values[i] is None and key in shared:
+                values[i] = shared[key]
+        n_local = len(keys) - len(missing)
+        n_missed = sum(value is None for value in values)
+        with self._lock:
+            self.shared_hits += len(shared)
+            self.misses += n_missed
+        CACHE_LOOKUPS.inc(n_local, result='hit')
+        CACHE_LOOKUPS.inc(len(shared), result='shared_hit')
+        CACHE_LOOKUPS.inc(n_missed, result='miss')
+
+        return keys, values
+
+    def _put_local(self, version, items):
+        expires_at = time.monotonic() + self.cache_config.ttl_seconds
+        with self._lock:
+            if version != self._version:
+                return
+            for key, value in items:
+                self._entries[key] = (value, expires_at)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.cache_config.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def store(self, version, keys, values):
+        items = [(key, float(value)) for key, value in zip(keys, values)]
+        self._put_local(version, items)
+        self._shared_put(version, items)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._version = None
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.shared_hits + self.misses
+            return {
+                'version': self._version,
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'shared_hits': self.shared_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': (self.hits + self.shared_hits) / lookups if lookups else 0.0,
+            }
+
+
+_prediction_cache = None
+_prediction_cache_lock = threading.Lock()
+
+def get_prediction_cache():
+    global _prediction_cache
+    if _prediction_cache is None:
+        with _prediction_cache_lock:
+            if _prediction_cache is None:
+                _prediction_cache = PredictionCache()
+    return _prediction_cache
@@ -0,0 +1,211 @@
+import logging
+from src.exception import CustomException
+
+import os
+import sys
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+from src.metrics import counter, histogram
+
+SERVICE_REJECTIONS = counter('prediction_service_rejections_total', 'Requests shed by the prediction service',
+                             ['reason'])
+SERVICE_QUEUE_SECONDS = histogram('prediction_service_queue_seconds', 'Time a request waits for a pool worker')
+SERVICE_BATCH_SIZE = histogram('prediction_service_batch_records', 'Records per prediction pool task',
+                               buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256))
+
+@dataclass
+class PredictionServiceConfig:
+    # Pool threads running predictions; numpy, sklearn and the boosters
+    # release the GIL in their heavy loops.
+    n_workers: int = min(4, os.cpu_count() or 1)
+    # Requests allowed to wait for a worker; beyond this they get a 429.
+    max_queue_size: int = 256
+    # Records merged into one pool task from consecutive queued requests.
+    max_batch_records: int = 64
+    default_deadline_ms: float = 1000.0
+    max_deadline_ms: float = 30_000.0
+    # Readiness fails once the queue is this full, so the load balancer
+    # stops routing here before requests start missing their deadlines.
+    ready_queue_fraction: float = 0.5
+
+
+class ServiceOverloaded(Exception):
+    '''
+    The request was shed without running; status is 429 or 503.
+    '''
+    def __init__(self, message, status, retry_after=1):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+
+class _Request:
+    __slots__ = ('records', 'future', 'deadline', 'enqueued_at')
+
+    def __init__(self, records, future, deadline):
+        self.records = records
+        self.future = future
+        self.deadline = deadline
+        self.enqueued_at = time.monotonic()
+
+
+class PredictionService:
+    '''
+    Asyncio front end for a blocking predict_fn(records): requests wait in a
+    bounded queue, dispatchers merge consecutive requests into one pool task,
+    and work that cannot finish before its deadline is shed instead of run.
+    '''
+    def __init__(self, predict_fn, config=None, warm_up_fn=None):
+        self.predict_fn = predict_fn
+        self.warm_up_fn = warm_up_fn
+        self.service_config = config or PredictionServiceConfig()
+        self._queue = None
+        self._executor = None
+        self._dispatchers = []
+        self._busy = 0
+        # Smoothed pool time per request, used to reject work that would miss its deadline.
+        self._seconds_per_request = None
+        self.ready = False
+        self.started = False
+
+    async def start(self):
+        config = self.service_config
+        self._queue = asyncio.Queue(maxsize=config.max_queue_size)
+        self._executor = ThreadPoolExecutor(max_workers=config.n_workers, thread_name_prefix="prediction")
+        self.started = True
+
+        if self.warm_up_fn is not None:
+            try:
+                await asyncio.get_running_loop().run_in_executor(self._executor, self.warm_up_fn)
+            except Exception as e:
+                # Serve anyway; the registry loads on the first request once artifacts exist.
+                logging.error(f"Prediction service warm-up failed: {e}")
+
+        self._dispatchers = [asyncio.create_task(self._dispatch()) for _ in range(config.n_workers)]
+        self.ready = True
+        logging.info(f"Prediction service started with {config.n_workers} workers, queue {config.max_queue_size}")
+
+    async def stop(self):
+        self.ready = False
+        for task in self._dispatchers:
+            task.cancel()
+        await asyncio.gather(*self._dispatchers, return_exceptions=True)
+        self._dispatchers = []
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+        self.started = False
+
+    def queue_depth(self):
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def estimated_wait(self):
+        '''
+        Seconds until a request submitted now would have its prediction.
+        '''
+        if self._seconds_per_request is None:
+            return 0.0
+        return (self.queue_depth() / self.service_config.n_workers + 1) * self._seconds_per_request
+
+    def is_ready(self):
+        config = self.service_config
+        return self.ready and self.queue_depth() < config.ready_queue_fraction * config.max_queue_size
+
+    def stats(self):
+        return {
+            'ready': self.is_ready(),
+            'queue_depth': self.queue_depth(),
+            'max_queue_size': self.service_config.max_queue_size,
+            'busy_workers': self._busy,
+            'n_workers': self.service_config.n_workers,
+            'estimated_wait_ms': self.estimated_wait() * 1000.0,
+        }
+
+    def _deadline(self, deadline_ms):
+        config = self.service_config
+        deadline_ms = config.default_deadline_ms if deadline_ms is None else min(deadline_ms, config.max_deadline_ms)
+        return time.monotonic() + deadline_ms / 1000.0
+
+    async def predict(self, records, deadline_ms=None):
+        '''
+        Predicts a list of validated records or raises ServiceOverloaded.
+        '''
+        deadline = self._deadline(deadline_ms)
+        if time.monotonic() + self.estimated_wait() > deadline:
+            SERVICE_REJECTIONS.inc(reason='deadline_unreachable')
+            raise ServiceOverloaded("Prediction would not finish before the request deadline", status=503)
+
+        request = _Request(records, asyncio.get_running_loop().create_future(), deadline)
+        try:
+            self._queue.put_nowait(request)
+        except asyncio.QueueFull:
+            SERVICE_REJECTIONS.inc(reason='queue_full')
+            raise ServiceOverloaded("Prediction queue is full", status=429)
+
+        try:
+            # On timeout wait_for cancels the future, so a dispatcher skips the request.
+            return await asyncio.wait_for(request.future, timeout=max(0.0, deadline - time.monotonic()))
+        except asyncio.TimeoutError:
+            SERVICE_REJECTIONS.inc(reason='deadline_exceeded')
+            raise ServiceOverloaded("Prediction did not finish before the request deadline", status=503)
+
+    def _take_batch(self, first):
+        batch, n_records = [first], len(first.records)
+        while n_records < self.service_config.max_batch_records:
+            try:
+                request = self._queue.get_nowait()
+            except asyncio.QueueEmpty:
+                break
+            batch.append(request)
+            n_records += len(request.records)
+        return batch
+
+    async def _dispatch(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = self._take_batch(await self._queue.get())
+
+            now = time.monotonic()
+            live = []
+            for request in batch:
+                SERVICE_QUEUE_SECONDS.observe(now - request.enqueued_at)
+                # The client has already been answered with a 503, skip the work.
+                if request.deadline <= now or request.future.done():
+                    SERVICE_REJECTIONS.inc(reason='expired_in_queue')
+                    continue
+                live.append(request)
+            if not live:
+                continue
+
+            records = [record for request in live for record in request.records]
+            SERVICE_BATCH_SIZE.observe(len(records))
+            self._busy += 1
+            start = time.perf_counter()
+            try:
+                preds = await loop.run_in_executor(self._executor, self.predict_fn, records)
+                self._observe_service_time(time.perf_counter() - start, len(live))
+
+                offset = 0
+                for request in live:
+                    n = len(request.records)
+                    if not request.future.done():
+                        request.future.set_result([float(pred) for pred in preds[offset:offset + n]])
+                    offset += n
+
+            except Exception as e:
+                logging.error(f"Error occured at prediction service stage: {e}")
+                error = e if isinstance(e, CustomException) else CustomException(e, sys)
+                for request in live:
+                    if not request.future.done():
+                        request.future.set_exception(error)
+            finally:
+                self._busy -= 1
+
+    def _observe_service_time(self, seconds, n_requests):
+        per_request = seconds / n_requests
+        if self._seconds_per_request is None:
+            self._seconds_per_request = per_request
+        else:
+            self._seconds_per_request = 0.8 * self._seconds_per_request + 0.2 * per_request
@@ -0,0 +1,150 @@
+import logging
+from src.exception import CustomException
+
+import sys
+import json
+import hashlib
+from collections import OrderedDict
+
+import numpy as np
+
+from src.components.trial_cache import array_fingerprint
+
+# Fold rows and native training matrices built inside a worker process,
+# reused by every later trial on the same split in that process.
+_worker_cache = OrderedDict()
+WORKER_CACHE_ENTRIES = 16
+
+
+def _cached(key, build):
+    if key in _worker_cache:
+        _worker_cache.move_to_end(key)
+        return _worker_cache[key]
+    value = build()
+    _worker_cache[key] = value
+    while len(_worker_cache) > WORKER_CACHE_ENTRIES:
+        _worker_cache.popitem(last=False)
+    return value
+
+
+def release_worker_cache():
+    # Workers that run in the training process itself (n_jobs=1) would
+    # otherwise hold the native matrices until the next search.
+    _worker_cache.clear()
+
+
+def kfold_ids(n_samples, cv):
+    # Same contiguous blocks as KFold(n_splits=cv) without shuffling.
+    sizes = np.full(cv, n_samples // cv)
+    sizes[:n_samples % cv] += 1
+    return np.repeat(np.arange(cv, dtype=np.int8), sizes)
+
+
+def data_representation(estimator):
+    library = type(estimator).__module__.split('.')[0]
+    if library in ('xgboost', 'catboost'):
+        return library
+    return 'raw'
+
+
+class SearchData:
+    '''
+    Training data shared by every trial of one model search. Fold rows and
+    the XGBoost/CatBoost quantized training matrices are built once per
+    worker process and reused by every candidate scored on the same split.
+    Both libraries quantize the raw features the same way in a plain fit,
+    so trial scores stay comparable with the refit; other models train on
+    the raw features.
+    '''
+    def __init__(self, token, X_train, y_train, X_test, y_test, row_order, cv, binned=True):
+        self.token = token
+        self.X_train = X_train
+        self.y_train = y_train
+        self.X_test = X_test
+        self.y_test = y_test
+        self.row_order = row_order
+        self.cv = cv
+        self.binned = binned
+
+    @classmethod
+    def prepare(cls, X_train, y_train, X_test, y_test, row_order, cv, fingerprint, binned=True):
+        try:
+            settings = {'fingerprint': fingerprint, 'row_order': array_fingerprint(row_order), 'cv': cv}
+            token = hashlib.sha256(json.dumps(settings, sort_keys=True).encode()).hexdigest()[:16]
+            return cls(token, X_train, y_train, X_test, y_test, np.asarray(row_order, dtype=np.int64), cv,
+                       binned=binned)
+
+        except Exception as e:
+            logging.error(f"Error occured at search data stage: {e}")
+            raise CustomException(e, sys)
+
+    def fold_rows(self, n_samples, fold):
+        '''
+        (train_rows, eval_rows) of a CV fold over the first n_samples rows
+        of row_order; (None, None) is the full train set scored on the test set.
+        '''
+        if fold is None:
+            return None, None
+
+        def build():
+            rows = np.asarray(self.row_order[:n_samples])
+            ids = kfold_ids(n_samples, self.cv)
+            return rows[ids != fold], rows[ids == fold]
+
+        return _cached((self.token, 'folds', n_samples, fold), build)
+
+    def _xgboost_matrix(self, estimator, n_samples, fold, train_rows, n_threads):
+        import xgboost
+
+        max_bin = estimator.get_params().get('max_bin') or 256
+        # Cut points are sketched once on the full train set; fold matrices only look up bins.
+        base = _cached((self.token, 'xgboost', max_bin),
+                       lambda: xgboost.QuantileDMatrix(np.asarray(self.X_train), np.asarray(self.y_train),
+                                                       max_bin=max_bin, nthread=n_threads))
+        if train_rows is None:
+            return base
+        return _cached((self.token, 'xgboost', max_bin, n_samples, fold),
+                       lambda: xgboost.QuantileDMatrix(self.X_train[train_rows], self.y_train[train_rows],
+                                                       ref=base, max_bin=max_bin, nthread=n_threads))
+
+    def _catboost_pool(self, estimator, n_samples, fold, train_rows):
+        from catboost import Pool
+
+        border_count = estimator.get_params().get('border_count') or 254
+
+        def build_base():
+            pool = Pool(np.asarray(self.X_train), np.asarray(self.y_train))
+            pool.quantize(border_count=border_count)
+            return pool
+
+        base = _cached((self.token, 'catboost', border_count), build_base)
+        if train_rows is None:
+            return base
+        return _cached((self.token, 'catboost', border_count, n_samples, fold), lambda: base.slice(train_rows))
+
+    def fit_predict(self, estimator, n_samples, fold, n_threads=1):
+        '''
+        Fits `estimator` on the train side of the split and returns
+        (y_eval, predictions) for its eval side.
+        '''
+        train_rows, eval_rows = self.fold_rows(n_samples, fold)
+        y_eval = self.y_test if eval_rows is None else self.y_train[eval_rows]
+        X_eval = self.X_test if eval_rows is None else self.X_train[eval_rows]
+        representation = data_representation(estimator) if self.binned else 'raw'
+
+        if representation == 'xgboost':
+            import xgboost
+
+            dtrain = self._xgboost_matrix(estimator, n_samples, fold, train_rows, n_threads)
+            params = {key: value for key, value in estimator.get_xgb_params().items() if value is not None}
+            booster = xgboost.train(params, dtrain, num_boost_round=estimator.get_num_boosting_rounds())
+            return y_eval, booster.inplace_predict(np.asarray(X_eval))
+
+        if representation == 'catboost':
+            estimator.fit(self._catboost_pool(estimator, n_samples, fold, train_rows))
+            return y_eval, estimator.predict(np.asarray(X_eval))
+
+        X_fit = self.X_train if train_rows is None else self.X_train[train_rows]
+        y_fit = self.y_train if train_rows is None else self.y_train[train_rows]
+        estimator.fit(X_fit, y_fit)
+        return y_eval, estimator.predict(X_eval)
@@ -0,0 +1,126 @@
+import logging
+from src.exception import CustomException
+
+import os
+import sys
+import json
+import time
+import hashlib
+import importlib.util
+from dataclasses import dataclass
+
+from src.utils import file_sha256, track_peak_memory
+from src.metrics import counter, histogram
+
+TRAINING_STAGE_SECONDS = histogram('training_stage_seconds', 'Wall clock time of each training stage', ['stage'])
+STAGE_RUNS = counter('training_stage_runs_total', 'Pipeline stages by whether they ran or were up to date',
+                     ['stage', 'outcome'])
+
+@dataclass
+class StageRunnerConfig:
+    manifest_dir: str = os.path.join('artifacts', 'stages')
+
+
+def file_digest(file_path):
+    return file_sha256(file_path)
+
+
+def code_digest(*module_names):
+    '''
+    Hash of the source files of the named modules, located without
+    importing them.
+    '''
+    digest = hashlib.sha256()
+    for name in module_names:
+        spec = importlib.util.find_spec(name)
+        if spec is None or not spec.has_location:
+            raise ModuleNotFoundError(f"No source file found for module '{name}'")
+        digest.update(file_sha256(spec.origin).encode())
+    return digest.hexdigest()
+
+
+def config_digest(obj):
+    return hashlib.sha256(json.dumps(obj, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class StageRunner:
+    '''
+    Runs a pipeline stage only when the hash of its inputs (data files, code,
+    config sections, upstream outputs) differs from the one recorded the last
+    time its outputs were produced.
+    '''
+    def __init__(self, config=None, force=False):
+        self.stage_runner_config = config or StageRunnerConfig()
+        self.force = force
+
+    def _manifest_path(self, name):
+        return os.path.join(self.stage_runner_config.manifest_dir, f"{name}.json")
+
+    def read_manifest(self, name):
+        path = self._manifest_path(name)
+        if not os.path.isfile(path):
+            return None
+        with open(path) as file_obj:
+            return json.load(file_obj)
+
+    def output_digest(self, name, file_path):
+        '''
+        Content hash of an upstream stage's output, as recorded in its manifest.
+        '''
+        manifest = self.read_manifest(name)
+        if manifest is None or file_path not in manifest['outputs']:
+            return file_digest(file_path)
+        return manifest['outputs'][file_path]['sha256']
+
+    def _outputs_intact(self, manifest, outputs):
+        for path in outputs:
+            recorded = manifest['outputs'].get(path)
+            if recorded is None or not os.path.isfile(path):
+                return False
+            stat = os.stat(path)
+            if (stat.st_size, stat.st_mtime_ns) != (recorded['size'], recorded['mtime_ns']):
+                return False
+        return True
+
+    def run(self, name, fn, inputs, outputs):
+        try:
+            key = config_digest(inputs)
+            manifest = self.read_manifest(name)
+
+            if not self.force and manifest is not None and manifest['key'] == key \
+                    and self._outputs_intact(manifest, outputs):
+                logging.info(f"Stage {name} is up to date ({key[:12]}), skipping")
+                STAGE_RUNS.inc(stage=name, outcome='skipped')
+                return manifest.get('result')
+
+            logging.info(f"Stage {name} running ({key[:12]})")
+            start = time.perf_counter()
+            with track_peak_memory(f"Stage {name}") as memory:
+                result = fn()
+            seconds = time.perf_counter() - start
+            TRAINING_STAGE_SECONDS.observe(seconds, stage=name)
+            STAGE_RUNS.inc(stage=name, outcome='ran')
+
+            recorded = {}
+            for path in outputs:
+                stat = os.stat(path)
+                recorded[path] = {'sha256': file_digest(path), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+            try:
+                json.dumps(result)
+            except TypeError:
+                result = None
+
+            os.makedirs(self.stage_runner_config.manifest_dir, exist_ok=True)
+            manifest_path = self._manifest_path(name)
+            with open(f"{manifest_path}.tmp", 'w') as file_obj:
+                json.dump({'key': key, 'inputs': inputs, 'outputs': recorded, 'result': result,
+                           'seconds': seconds, 'peak_rss_mb': memory['peak_rss_mb']}, file_obj, indent=2)
+            os.replace(f"{manifest_path}.tmp", manifest_path)
+
+            logging.info(f"Stage {name} completed in {seconds:.1f}s")
+            return result
+
+        except Exception as e:
+            logging.error(f"Error occured at stage runner for {name}: {e}")
+            raise CustomException(e, sys)
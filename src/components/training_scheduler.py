@@ -0,0 +1,323 @@
+import logging
+from src.exception import CustomException
+
+import os
+import sys
+import math
+import time
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed
+from threadpoolctl import threadpool_limits
+from sklearn.base import clone
+from sklearn.metrics import r2_score
+from sklearn.model_selection import ParameterGrid, ParameterSampler
+
+from src.components.trial_cache import TrialCache, append_trial, array_fingerprint, trial_key
+from src.components.search_data import SearchData, release_worker_cache
+from src.metrics import counter, histogram
+
+TRAINING_STAGE_SECONDS = histogram('training_stage_seconds', 'Wall clock time of each training stage', ['stage'])
+FIT_SECONDS = histogram('training_fit_seconds', 'Fit and score time of one search trial or refit', ['model', 'phase'])
+TRIALS = counter('training_trials_total', 'Search trials by model and whether the trial cache served them',
+                 ['model', 'source'])
+
+THREAD_PARAMS = ('n_jobs', 'nthread', 'thread_count')
+
+@dataclass
+class TrainingSchedulerConfig:
+    # 0 sizes the worker pool to the cores this process may run on.
+    n_workers: int = 0
+    cv: int = 5
+    n_iter: int = 10
+    random_state: int = 42
+    # 'random' scores every candidate on the full train set; 'halving' runs
+    # successive halving, growing the sample size while dropping weak candidates.
+    search_mode: str = 'random'
+    halving_candidates: int = 27
+    halving_factor: int = 3
+    min_resources: int = 1000
+    # Finished trial scores are kept here across runs; empty disables the cache.
+    trial_cache_dir: str = os.path.join('artifacts', 'trial_cache')
+    # XGBoost/CatBoost search trials reuse quantized training matrices built
+    # once per worker; they score exactly like a fit on the raw features.
+    binned_search: bool = True
+    report_path: str = os.path.join('artifacts', 'model_report.csv')
+
+
+@dataclass
+class Trial:
+    model_name: str
+    params: dict
+    # CV fold over the first n_samples rows of the search order; fold None
+    # means fit on the full train set and score on the test set.
+    n_samples: int
+    fold: object
+    key: str
+
+
+def available_cpus():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def limit_model_threads(model, n_threads):
+    '''
+    Caps the native thread pool of a model so that concurrent fits share the
+    machine instead of each grabbing every core.
+    '''
+    params = model.get_params(deep=False)
+    updates = {name: n_threads for name in ('n_jobs', 'nthread') if name in params}
+    if 'thread_count' in params or type(model).__module__.startswith('catboost'):
+        updates['thread_count'] = n_threads
+    if updates:
+        model.set_params(**updates)
+    return model
+
+
+def _fit(model, params, X, y, n_threads):
+    estimator = limit_model_threads(clone(model).set_params(**params), n_threads)
+    with threadpool_limits(limits=n_threads):
+        estimator.fit(X, y)
+    return estimator
+
+
+def _trial_task(trial, model, data, cache_path, n_threads):
+    start = time.perf_counter()
+    try:
+        estimator = limit_model_threads(clone(model).set_params(**trial.params), n_threads)
+        with threadpool_limits(limits=n_threads):
+            y_eval, preds = data.fit_predict(estimator, trial.n_samples, trial.fold, n_threads)
+            score = float(r2_score(y_eval, preds))
+    except Exception as e:
+        # Like RandomizedSearchCV's error_score=nan: the candidate is dropped,
+        # the search goes on, and the failure is retried on the next run.
+        logging.warning(f"Trial of {trial.model_name} with {trial.params} (fold {trial.fold}) failed: {e}")
+        return float('nan'), time.perf_counter() - start
+
+    seconds = time.perf_counter() - start
+    if cache_path:
+        append_trial(cache_path, trial.key, score, seconds)
+    return score, seconds
+
+
+def _refit_task(model_name, model, params, X_train, y_train, X_test, y_test, n_threads):
+    start = time.perf_counter()
+    estimator = _fit(model, params, X_train, y_train, n_threads)
+    with threadpool_limits(limits=n_threads):
+        score = r2_score(y_test, estimator.predict(X_test))
+    return model_name, estimator, score, time.perf_counter() - start
+
+
+class TrainingScheduler:
+    '''
+    Runs the vanilla fit and every candidate x CV fold of every model as
+    independent trials on one worker pool sized to the machine.
+    '''
+    def __init__(self, config=None):
+        self.scheduler_config = config or TrainingSchedulerConfig()
+
+    def _worker_budget(self, n_tasks):
+        cpus = available_cpus()
+        n_workers = self.scheduler_config.n_workers or cpus
+        n_workers = max(1, min(n_workers, n_tasks))
+        n_threads = max(1, cpus // n_workers)
+        return n_workers, n_threads
+
+    def _sample_candidates(self, param, n_iter):
+        if all(isinstance(values, (list, tuple)) for values in param.values()):
+            n_iter = min(n_iter, len(ParameterGrid(param)))
+        return list(ParameterSampler(param, n_iter=n_iter, random_state=self.scheduler_config.random_state))
+
+    def _trial(self, model_name, model, params, **split):
+        config = self.scheduler_config
+        base_params = {k: v for k, v in model.get_params(deep=False).items() if k not in THREAD_PARAMS}
+        key = trial_key(model=model_name, estimator=type(model).__name__, base_params=base_params,
+                        params=params, data=self._fingerprint, **split)
+        return Trial(model_name, params, split.get('n_samples'), split.get('fold'), key)
+
+    def _cv_trials(self, model_name, model, candidates, n_samples):
+        config = self.scheduler_config
+        return [
+            self._trial(model_name, model, candidate, split='cv', n_samples=n_samples, fold=fold, cv=config.cv,
+                        random_state=config.random_state)
+            for candidate in candidates
+            for fold in range(config.cv)
+        ]
+
+    def _run_trials(self, trials, models, data, stage):
+        pending = [trial for trial in trials if trial.key not in self._cache]
+        logging.info(f"{stage}: {len(trials)} trials, {len(trials) - len(pending)} served from the trial cache")
+        for trial in trials:
+            TRIALS.inc(model=trial.model_name, source='run' if trial.key not in self._cache else 'cache')
+
+        if pending:
+            n_workers, n_threads = self._worker_budget(len(pending))
+            logging.info(f"{stage}: running {len(pending)} trials on {n_workers} workers x {n_threads} threads")
+            results = Parallel(n_jobs=n_workers)(
+                delayed(_trial_task)(trial, models[trial.model_name], data, self._cache.file_path, n_threads)
+                for trial in pending
+            )
+            for trial, (score, seconds) in zip(pending, results):
+                # Failed trials score NaN for this run only; they never reach the cache file.
+                self._cache.put(trial.key, score)
+                if np.isnan(score):
+                    TRIALS.inc(model=trial.model_name, source='failed')
+                self._fit_seconds[trial.model_name] += seconds
+                FIT_SECONDS.observe(seconds, model=trial.model_name, phase='search')
+
+    def _mean_cv_scores(self, name, cv_trials, candidates):
+        # Trials are laid out candidate-major, fold-minor; a failed fold makes
+        # its candidate's mean NaN, which ranks below every real score.
+        scores = np.array([self._cache.get(trial.key) for trial in cv_trials], dtype=np.float64)
+        mean_scores = scores.reshape(len(candidates), -1).mean(axis=1)
+        if np.isnan(mean_scores).all():
+            raise ValueError(f"Every search candidate of {name} failed, see the trial warnings")
+        return np.where(np.isnan(mean_scores), -np.inf, mean_scores)
+
+    def _random_search(self, models, params, data, vanilla_trials):
+        candidates = {name: self._sample_candidates(params[name], self.scheduler_config.n_iter) for name in models}
+        cv_trials = {name: self._cv_trials(name, model, candidates[name], len(data.y_train))
+                     for name, model in models.items()}
+
+        # Vanilla fits and the whole randomized search share one pool.
+        trials = vanilla_trials + [trial for name in models for trial in cv_trials[name]]
+        self._run_trials(trials, models, data, "Randomized search")
+
+        best = {}
+        for name in models:
+            mean_scores = self._mean_cv_scores(name, cv_trials[name], candidates[name])
+            index = int(np.argmax(mean_scores))
+            best[name] = (candidates[name][index], float(mean_scores[index]))
+        return best
+
+    def _halving_schedule(self, n_candidates, n_samples):
+        config = self.scheduler_config
+        n_rounds = 1 + int(math.floor(math.log(max(n_candidates, 1), config.halving_factor)))
+        schedule = []
+        for round_index in range(n_rounds):
+            resources = n_samples // config.halving_factor ** (n_rounds - 1 - round_index)
+            schedule.append(int(min(n_samples, max(resources, config.min_resources, 2 * config.cv))))
+        return schedule
+
+    def _halving_search(self, models, params, data, vanilla_trials):
+        config = self.scheduler_config
+        alive = {name: self._sample_candidates(params[name], config.halving_candidates) for name in models}
+        schedules = {name: self._halving_schedule(len(alive[name]), len(data.y_train)) for name in models}
+        best = {}
+
+        round_index = 0
+        while alive:
+            cv_trials = {
+                name: self._cv_trials(name, models[name], alive[name], schedules[name][round_index])
+                for name in alive
+            }
+            trials = [trial for name in alive for trial in cv_trials[name]]
+            if round_index == 0:
+                trials = vanilla_trials + trials
+            self._run_trials(trials, models, data, f"Halving round {round_index + 1}")
+
+            for name in list(alive):
+                candidates = alive[name]
+                mean_scores = self._mean_cv_scores(name, cv_trials[name], candidates)
+                order = np.argsort(-mean_scores)
+                best[name] = (candidates[int(order[0])], float(mean_scores[order[0]]))
+
+                if round_index + 1 >= len(schedules[name]) or len(candidates) == 1:
+                    del alive[name]
+                    continue
+
+                n_keep = int(math.ceil(len(candidates) / config.halving_factor))
+                alive[name] = [candidates[int(i)] for i in order[:n_keep]]
+                logging.info(f"{name}: kept {n_keep} of {len(candidates)} candidates after {schedules[name][round_index]} samples")
+
+            round_index += 1
+
+        return best
+
+    def evaluate(self, X_train, y_train, X_test, y_test, models, params):
+        try:
+            config = self.scheduler_config
+            start = time.perf_counter()
+
+            self._fingerprint = array_fingerprint(X_train, y_train, X_test, y_test)
+            self._cache = TrialCache(config.trial_cache_dir)
+            self._fit_seconds = {name: 0.0 for name in models}
+            if config.search_mode == 'halving':
+                # Halving rounds take growing prefixes of one fixed shuffle of the rows.
+                row_order = np.random.default_rng(config.random_state).permutation(len(y_train))
+            else:
+                row_order = np.arange(len(y_train))
+
+            with TRAINING_STAGE_SECONDS.time(stage='search_data'):
+                data = SearchData.prepare(X_train, y_train, X_test, y_test, row_order, config.cv, self._fingerprint,
+                                          binned=config.binned_search)
+
+            vanilla_trials = [
+                self._trial(name, model, {}, split='holdout')
+                for name, model in models.items()
+            ]
+
+            if config.search_mode == 'halving':
+                best = self._halving_search(models, params, data, vanilla_trials)
+            elif config.search_mode == 'random':
+                best = self._random_search(models, params, data, vanilla_trials)
+            else:
+                raise ValueError(f"Unknown search_mode '{config.search_mode}'")
+            release_worker_cache()
+
+            # Refit every model's best candidate on the full train set.
+            n_workers, n_threads = self._worker_budget(len(models))
+            logging.info(f"Refit: {len(models)} models on {n_workers} workers x {n_threads} threads")
+            refits = Parallel(n_jobs=n_workers)(
+                delayed(_refit_task)(name, model, best[name][0], X_train, y_train, X_test, y_test, n_threads)
+                for name, model in models.items()
+            )
+
+            vanilla = {trial.model_name: self._cache.get(trial.key) for trial in vanilla_trials}
+            export = []
+            report = {}
+            for name, best_model, tuned_score, seconds in refits:
+                self._fit_seconds[name] += seconds
+                FIT_SECONDS.observe(seconds, model=name, phase='refit')
+                vanilla_score = vanilla[name]
+                fit_seconds = self._fit_seconds[name]
+                logging.info(f"{name} vanilla r2 score: {vanilla_score}")
+                logging.info(f"{name} tuned r2 score: {tuned_score}, fit time {fit_seconds:.1f}s")
+
+                export.append({
+                    'model': name,
+                    'vanilla_test_score': vanilla_score,
+                    'best_parameters': best[name][0],
+                    'best_rs_score': best[name][1],
+                    'tuned_test_score': tuned_score,
+                    'fit_seconds': fit_seconds,
+                })
+
+                report[name] = {
+                    'vanilla_score': vanilla_score,
+                    'tuned_score': tuned_score,
+                    'best_score': float(np.nanmax([vanilla_score, tuned_score])),
+                    'is_tuned_better': bool(np.isnan(vanilla_score) or tuned_score > vanilla_score),
+                    'best_model': best_model,
+                    'fit_seconds': fit_seconds,
+                }
+
+            seconds = time.perf_counter() - start
+            TRAINING_STAGE_SECONDS.observe(seconds, stage='evaluate_models')
+            logging.info(f"Model evaluation completed in {seconds:.1f}s wall clock")
+
+            export = pd.DataFrame(export).sort_values(by='tuned_test_score', ascending=False)
+            os.makedirs(os.path.dirname(config.report_path), exist_ok=True)
+            export.to_csv(config.report_path, index=False)
+            logging.info(f"Model report saved at {config.report_path}")
+
+            return report
+
+        except Exception as e:
+            logging.error(f"Error occured at training scheduler stage: {e}")
+            raise CustomException(e, sys)
@@ -0,0 +1,75 @@
+import logging
+from src.exception import CustomException
+
+import os
+import sys
+import json
+import hashlib
+
+import numpy as np
+
+def array_fingerprint(*arrays):
+    digest = hashlib.sha256()
+    for array in arrays:
+        array = np.ascontiguousarray(array)
+        digest.update(f"{array.shape}{array.dtype}".encode())
+        digest.update(memoryview(array).cast('B'))
+    return digest.hexdigest()
+
+
+def trial_key(**fields):
+    payload = json.dumps(fields, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def append_trial(file_path, key, score, seconds):
+    '''
+    Appends one finished trial. Called from worker processes; a single
+    O_APPEND write keeps concurrent lines from interleaving.
+    '''
+    line = json.dumps({'key': key, 'score': score, 'seconds': seconds}) + "\n"
+    fd = os.open(file_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        os.write(fd, line.encode())
+    finally:
+        os.close(fd)
+
+
+class TrialCache:
+    '''
+    On-disk store of finished trial scores, keyed by model, parameters, data
+    fingerprint and fold, so an interrupted or repeated search skips them.
+    '''
+    def __init__(self, cache_dir):
+        self.file_path = os.path.join(cache_dir, 'trials.jsonl') if cache_dir else None
+        self.trials = {}
+
+        try:
+            if self.file_path is None:
+                return
+
+            os.makedirs(cache_dir, exist_ok=True)
+            if os.path.isfile(self.file_path):
+                with open(self.file_path) as file_obj:
+                    for line in file_obj:
+                        try:
+                            trial = json.loads(line)
+                        except json.JSONDecodeError:
+                            # A run killed mid-write leaves at most one torn line.
+                            continue
+                        self.trials[trial['key']] = trial['score']
+
+            logging.info(f"Trial cache at {self.file_path} holds {len(self.trials)} trials")
+
+        except Exception as e:
+            logging.error(f"Error occured at trial cache stage: {e}")
+            raise CustomException(e, sys)
+
+    def __contains__(self, key):
+        return key in self.trials
+
+    def get(self, key):
+        return self.trials[key]
+
+    def put(self, key, score):
+        self.trials[key] = score
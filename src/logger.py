@@ -2,15 +2,25 @@ import logging
 import os
 from datetime import datetime
 
-LOG_FILE=f"{datetime.now().strftime('%m_%d_%Y_%H_%M_%S')}.log"
-logs_path = os.path.join(os.getcwd(), "logs", LOG_FILE)
-os.makedirs(logs_path, exist_ok=True)
+LOG_FORMAT = "[ %(asctime)s ] %(lineno)d %(name)s - %(levelname)s - %(message)s"
 
-LOG_FILE_PATH = os.path.join(logs_path, LOG_FILE)
 
-logging.basicConfig(
-    filename=LOG_FILE_PATH,
-    format="[ %(asctime)s ] %(lineno)d %(name)s - %(levelname)s - %(message)s",
-    level=logging.INFO
-)
+def setup_logging(level=logging.INFO):
+    '''
+    Sends log records to logs/<timestamp>.log under the working directory.
+    Entry points call this once; importing the module has no side effects,
+    and the file is only created when the first record is written.
+    '''
+    root = logging.getLogger()
+    if any(getattr(handler, '_src_logger', False) for handler in root.handlers):
+        return
 
+    logs_path = os.path.join(os.getcwd(), "logs")
+    os.makedirs(logs_path, exist_ok=True)
+    log_file = f"{datetime.now().strftime('%m_%d_%Y_%H_%M_%S')}.log"
+
+    handler = logging.FileHandler(os.path.join(logs_path, log_file), delay=True)
+    handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    handler._src_logger = True
+    root.addHandler(handler)
+    root.setLevel(level)
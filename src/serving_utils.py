@@ -0,0 +1,55 @@
+'''
+Artifact helpers needed to serve predictions. Kept apart from src.utils,
+which pulls in pandas for the training stages, so that a serving process
+only imports what it uses; dill is imported on the first (un)pickle.
+'''
+import os
+import sys
+import logging
+import hashlib
+
+from src.exception import CustomException
+
+def file_sha256(file_path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as file_obj:
+        for chunk in iter(lambda: file_obj.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def save_object(file_path, obj):
+    import dill
+
+    try:
+        dir_path = os.path.dirname(file_path)
+
+        os.makedirs(dir_path, exist_ok=True)
+
+        # Write to a temporary file and swap it in, so readers that reload
+        # artifacts on change never see a half-written pickle.
+        tmp_path = f"{file_path}.tmp.{os.getpid()}"
+        with open(tmp_path, "wb") as file_obj:
+            dill.dump(obj, file_obj)
+        os.replace(tmp_path, file_path)
+        
+        logging.info(f"Object saved at {file_path}")
+
+    except Exception as e:
+        logging.error(f"Error occured at save_object stage: {e}")
+        raise CustomException(e, sys)
+    
+
+def load_object(file_path):
+    import dill
+
+    try:
+        with open(file_path, "rb") as file_obj:
+            obj = dill.load(file_obj)
+        
+        logging.info(f"Object loaded from {file_path}")
+        return obj
+
+    except Exception as e:
+        logging.error(f"Error occured at load_object stage: {e}")
+        raise CustomException(e, sys)
@@ -1,126 +1,116 @@
 import os
 import sys
-import dill
-import csv
+import logging
+from contextlib import contextmanager
 import numpy as np
 import pandas as pd
 
 from src.exception import CustomException
-from src.logger import logging
+from src.serving_utils import file_sha256, save_object, load_object
 
-from sklearn.metrics import r2_score
-from sklearn.model_selection import RandomizedSearchCV
-
-def save_object(file_path, obj):
+def save_frame(df, file_path):
+    '''
+    Writes a DataFrame as Parquet with string columns stored as categoricals,
+    so stages exchange typed columns instead of re-parsing CSV text.
+    '''
     try:
-        dir_path = os.path.dirname(file_path)
-
-        os.makedirs(dir_path, exist_ok=True)
-
-        with open(file_path, "wb") as file_obj:
-            dill.dump(obj, file_obj)
-        
-        logging.info(f"Object saved at {file_path}")
-
-    except Exception as e:
-        logging.error(f"Error occured at save_object stage: {e}")
-        raise CustomException(e, sys)
-    
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        object_columns = df.select_dtypes(include=object).columns
+        if len(object_columns) > 0:
+            df = df.astype({column: 'category' for column in object_columns})
 
-def load_object(file_path):
-    try:
-        with open(file_path, "rb") as file_obj:
-            obj = dill.load(file_obj)
-        
-        logging.info(f"Object loaded from {file_path}")
-        return obj
+        tmp_path = f"{file_path}.tmp.{os.getpid()}"
+        df.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, file_path)
+        logging.info(f"Frame saved at {file_path}")
 
     except Exception as e:
-        logging.error(f"Error occured at load_object stage: {e}")
+        logging.error(f"Error occured at save_frame stage: {e}")
         raise CustomException(e, sys)
 
-    
-def evaluate_models(X_train, y_train, X_test, y_test, models, params):
-    try:
-        logging.info("Starting model evaluation")
-        export = []
-        report = {}
-
-        for i in range(len(models)):
-            model = list(models.values())[i]
-            model_name = list(models.keys())[i]
-
-            param = params[model_name]
-
-            logging.info(f"{model_name} vanilla fitting...")
-
-            model.fit(X_train, y_train)
-            y_pred = model.predict(X_test)
-            vanilla_score = r2_score(y_test, y_pred)
 
-            logging.info(f"{model_name} vanilla r2 score: {vanilla_score}")
-            logging.info(f"{model_name} hyperparameter tuning fitting...")
+def downcast_frame(df):
+    '''
+    Shrinks a frame in place of its wide defaults: integers to the smallest
+    integer type that holds them, floats to float32, strings to categoricals.
+    '''
+    for column in df.columns:
+        dtype = df[column].dtype
+        if pd.api.types.is_integer_dtype(dtype):
+            df[column] = pd.to_numeric(df[column], downcast='integer')
+        elif pd.api.types.is_float_dtype(dtype):
+            df[column] = df[column].astype(np.float32)
+        elif dtype == object:
+            df[column] = df[column].astype('category')
+    return df
 
-            rs = RandomizedSearchCV(model, param, cv=5, n_iter=10, n_jobs=4, verbose=0)
-            rs.fit(X_train, y_train)
 
-            best_model = rs.best_estimator_
-
-            y_pred_tuned = best_model.predict(X_test)
-            tuned_score = r2_score(y_test, y_pred_tuned)
-
-            logging.info(f"{model_name} tuned r2 score: {tuned_score}")
+def load_frame(file_path, columns=None):
+    try:
+        if file_path.endswith('.parquet'):
+            return pd.read_parquet(file_path, columns=columns)
+        if file_path.endswith('.feather'):
+            return pd.read_feather(file_path, columns=columns)
+        return pd.read_csv(file_path, usecols=columns)
 
-            result = {
-                'model': model_name,
-                'vanilla_test_score': vanilla_score,
-                'best_parameters': rs.best_params_,
-                'best_rs_score': rs.best_score_,
-                'tuned_test_score': tuned_score
-            }
-            export.append(result)
+    except Exception as e:
+        logging.error(f"Error occured at load_frame stage: {e}")
+        raise CustomException(e, sys)
 
-            report[model_name] = {
-                'vanilla_score': vanilla_score,
-                'tuned_score': tuned_score,
-                'best_score': max(vanilla_score, tuned_score),
-                'is_tuned_better': tuned_score > vanilla_score,
-                'best_model': best_model,
-            }
 
-        logging.info("Model evaluation completed")
-        logging.info(f"Exporting to csv...")
+def open_array(file_path, shape, dtype=np.float64):
+    '''
+    Creates a .npy file on disk and returns it as a writable memmap, so large
+    matrices are filled in place instead of built in memory first.
+    '''
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    return np.lib.format.open_memmap(file_path, mode='w+', dtype=dtype, shape=shape)
 
-        export = pd.DataFrame(export)
-        export = export.sort_values(by='tuned_test_score', ascending=False)
-        export_path = os.path.join("artifacts", "model_report.csv")
-        export.to_csv(export_path, index=False)
 
-        logging.info(f"Model report saved at {export_path}")
+def load_array(file_path, mmap_mode='r'):
+    try:
+        return np.load(file_path, mmap_mode=mmap_mode, allow_pickle=False)
 
-        return report
-    
     except Exception as e:
-        logging.error(f"Error occured at evaluate_models stage: {e}")
+        logging.error(f"Error occured at load_array stage: {e}")
         raise CustomException(e, sys)
-    
-    
-def save_user_input(data_dict, file_path="artifacts/user_input_logs.csv"):
+
+
+def _current_peak_rss():
+    try:
+        with open('/proc/self/status') as file_obj:
+            for line in file_obj:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+
+    import resource
+    # ru_maxrss is in KiB on Linux; it cannot be reset, so it is a lifetime peak.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+@contextmanager
+def track_peak_memory(stage):
+    '''
+    Logs the peak resident set size of this process while the block runs.
+    On Linux the high-water mark is reset on entry, so the value is per stage.
+    '''
+    stats = {}
     try:
-        dir_path = os.path.dirname(file_path)
-        os.makedirs(dir_path, exist_ok=True)
+        with open('/proc/self/clear_refs', 'w') as file_obj:
+            file_obj.write('5')
+    except OSError:
+        pass
 
-        file_exists = os.path.isfile(file_path)
+    try:
+        yield stats
+    finally:
+        stats['peak_rss_mb'] = _current_peak_rss() / 2**20
+        logging.info(f"{stage} peak RSS: {stats['peak_rss_mb']:.1f} MB")
 
-        with open(file_path, 'a') as f:
-            writer = csv.DictWriter(f, fieldnames=data_dict.keys())
-            if not file_exists:
-                writer.writeheader()
 
-            writer.writerow(data_dict)
-        
-        logging.info(f"User input data saved at {file_path}")
+def evaluate_models(X_train, y_train, X_test, y_test, models, params, config=None):
+    from src.components.training_scheduler import TrainingScheduler
 
-    except Exception as e:
-        logging.error(f"Error occured at save_user_input stage: {e}")
-        raise CustomException(e, sys)
\ No newline at end of file
+    return TrainingScheduler(config).evaluate(X_train, y_train, X_test, y_test, models, params)
@@ -0,0 +1,145 @@
+import copy
+
+import numpy as np
+import pytest
+from catboost import CatBoostRegressor
+from sklearn.ensemble import HistGradientBoostingRegressor
+from sklearn.linear_model import LinearRegression
+from xgboost import XGBRegressor
+
+from src.components.compiled_ensemble import (CompiledEnsemble, check_hist_gradient_boosting_internals,
+                                              export_compiled_ensemble, extract_trees)
+from src.components.compiled_preprocessor import model_input_dtype
+from src.exception import CustomException
+
+N_FEATURES = 5
+
+
+def make_data(n_rows=2000, nan_fraction=0.1, seed=0):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(n_rows, N_FEATURES))
+    # A few repeated values so thresholds land on values present in the data.
+    X[:, 3] = rng.integers(0, 5, size=n_rows)
+    y = 3 * X[:, 0] - 2 * np.abs(X[:, 1]) + X[:, 3] + rng.normal(scale=0.1, size=n_rows)
+    missing = rng.random(X.shape) < nan_fraction
+    # Rows missing feature 0 get a distinct target, so the trees learn where NaN goes.
+    y[missing[:, 0]] += 5.0
+    X[missing] = np.nan
+    return X, y
+
+
+def build_models():
+    return {
+        'hgb': HistGradientBoostingRegressor(max_iter=40, max_depth=5, random_state=0),
+        'xgb': XGBRegressor(n_estimators=40, max_depth=4, tree_method='hist', n_jobs=1),
+        'catboost_min': CatBoostRegressor(iterations=40, depth=4, nan_mode='Min', verbose=False, thread_count=1,
+                                          allow_writing_files=False),
+        'catboost_max': CatBoostRegressor(iterations=40, depth=4, nan_mode='Max', verbose=False, thread_count=1,
+                                          allow_writing_files=False),
+    }
+
+
+@pytest.fixture(scope='module')
+def fitted():
+    X, y = make_data()
+    return {name: model.fit(X, y) for name, model in build_models().items()}
+
+
+def compile_model(model):
+    trees, base_score = extract_trees(model)
+    return CompiledEnsemble.from_trees(trees, base_score, n_features=model.n_features_in_,
+                                       input_dtype=np.dtype(model_input_dtype(model)).name)
+
+
+def assert_matches(model, compiled, X, atol=1e-4):
+    X = np.asarray(X, dtype=compiled.input_dtype)
+    np.testing.assert_allclose(compiled.predict(X), model.predict(X), rtol=1e-5, atol=atol)
+
+
+def threshold_rows(compiled, X):
+    '''
+    Rows whose split feature sits exactly on every threshold of the
+    ensemble, and one ulp below it, for each of the libraries' conventions.
+    '''
+    internal = np.flatnonzero(compiled.left != np.arange(len(compiled.left)))
+    rows = np.repeat(np.nan_to_num(X[:1]), 2 * len(internal), axis=0)
+    values = np.concatenate([compiled.threshold[internal], np.nextafter(compiled.threshold[internal], -np.inf)])
+    rows[np.arange(len(rows)), np.tile(compiled.feature[internal], 2)] = values
+    return rows
+
+
+@pytest.mark.parametrize('name', ['hgb', 'xgb', 'catboost_min', 'catboost_max'])
+def test_matches_library_predict(fitted, name):
+    model = fitted[name]
+    X, _ = make_data(n_rows=500, seed=1)
+    assert_matches(model, compile_model(model), X)
+
+
+@pytest.mark.parametrize('name', ['hgb', 'xgb', 'catboost_min', 'catboost_max'])
+def test_missing_values_follow_default_direction(fitted, name):
+    model = fitted[name]
+    X, _ = make_data(n_rows=500, nan_fraction=0.5, seed=2)
+    X[:50] = np.nan
+    assert_matches(model, compile_model(model), X)
+
+
+@pytest.mark.parametrize('name', ['hgb', 'xgb', 'catboost_min', 'catboost_max'])
+def test_values_on_thresholds(fitted, name):
+    model = fitted[name]
+    compiled = compile_model(model)
+    X, _ = make_data(n_rows=10, seed=3)
+    rows = threshold_rows(compiled, X).astype(compiled.input_dtype)
+    # Thresholds stored in float64 may round onto the other side in float32 inputs;
+    # both sides see the same cast rows, so they must still agree.
+    assert_matches(model, compiled, rows)
+
+
+@pytest.mark.parametrize('name', ['hgb', 'xgb', 'catboost_min'])
+def test_prune_stays_within_tolerance(fitted, name):
+    model = fitted[name]
+    compiled = compile_model(model)
+    X, _ = make_data(n_rows=400, seed=4)
+    X = X.astype(compiled.input_dtype)
+
+    assert compiled.prune(X, 0.0).n_trees == compiled.n_trees
+
+    pruned = compiled.prune(X, 0.5)
+    assert pruned.n_trees < compiled.n_trees
+    assert np.max(np.abs(pruned.predict(X) - compiled.predict(X))) <= 0.5 + 1e-9
+
+
+@pytest.mark.parametrize('name', ['hgb', 'xgb', 'catboost_max'])
+def test_arrays_round_trip(fitted, name, tmp_path):
+    compiled = compile_model(fitted[name])
+    meta, arrays = compiled.to_arrays()
+    # Stored and mapped back the way the artifact store does it.
+    for key, array in arrays.items():
+        np.save(tmp_path / f"{key}.npy", array)
+    restored = CompiledEnsemble.from_arrays(meta, {key: np.load(tmp_path / f"{key}.npy", mmap_mode='r')
+                                                   for key in arrays})
+
+    X, _ = make_data(n_rows=300, seed=5)
+    X = X.astype(compiled.input_dtype)
+    np.testing.assert_array_equal(restored.predict(X), compiled.predict(X))
+    assert restored.to_arrays()[0] == meta
+
+
+def test_export_verifies_and_skips_unsupported_models(fitted):
+    X, y = make_data(n_rows=300, seed=6)
+    compiled = export_compiled_ensemble(fitted['xgb'], X)
+    assert compiled is not None and compiled.n_trees == 40
+
+    linear = LinearRegression().fit(np.nan_to_num(X), y)
+    assert export_compiled_ensemble(linear, np.nan_to_num(X)) is None
+
+
+def test_hist_gradient_boosting_internals_guard(fitted):
+    model = fitted['hgb']
+    check_hist_gradient_boosting_internals(model)
+
+    renamed = copy.deepcopy(model)
+    del renamed._baseline_prediction
+    with pytest.raises(RuntimeError, match='_baseline_prediction'):
+        check_hist_gradient_boosting_internals(renamed)
+    with pytest.raises(CustomException):
+        export_compiled_ensemble(renamed, make_data(n_rows=50)[0])
@@ -0,0 +1,89 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.components.compiled_preprocessor import CompiledPreprocessor, export_compiled_preprocessor
+from src.components.data_transformation import DataTransformation
+from src.exception import CustomException
+
+CATEGORIES = {
+    'gender': ['male', 'female', 'other'],
+    'course': ['b.sc', 'b.tech', 'bca', 'ba', 'diploma'],
+    'internet_access': ['yes', 'no'],
+    'sleep_quality': ['poor', 'average', 'good'],
+    'study_method': ['self-study', 'group study', 'online videos', 'coaching', 'mixed'],
+    'facility_rating': ['low', 'medium', 'high'],
+    'exam_difficulty': ['easy', 'moderate', 'hard'],
+}
+
+
+def make_frame(n_rows=500, nan_fraction=0.05, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        'id': np.arange(n_rows),
+        'age': rng.integers(17, 25, size=n_rows),
+        'study_hours': rng.uniform(0, 8, size=n_rows),
+        'class_attendance': rng.uniform(40, 100, size=n_rows),
+        'sleep_hours': rng.uniform(4, 10, size=n_rows),
+    })
+    for column, values in CATEGORIES.items():
+        df[column] = rng.choice(values, size=n_rows).astype(object)
+
+    for column in df.columns.drop('id'):
+        missing = rng.random(n_rows) < nan_fraction
+        if df[column].dtype == object:
+            df.loc[missing, column] = np.nan
+        else:
+            df[column] = df[column].astype(np.float64)
+            df.loc[missing, column] = np.nan
+    return df
+
+
+@pytest.fixture(scope='module')
+def fitted():
+    preprocessor = DataTransformation().get_data_transformer_object()
+    return preprocessor.fit(make_frame())
+
+
+def assert_matches(preprocessor, compiled, df):
+    expected = np.asarray(preprocessor.transform(df), dtype=np.float64)
+    np.testing.assert_allclose(compiled.transform(df, dtype=np.float64), expected, rtol=1e-7, atol=1e-9)
+    np.testing.assert_allclose(compiled.transform_records(df.to_dict(orient='records'), dtype=np.float64),
+                               expected, rtol=1e-7, atol=1e-9)
+
+
+def test_matches_sklearn_transform(fitted):
+    compiled = CompiledPreprocessor.from_preprocessor(fitted)
+    assert compiled.n_features_out == fitted.transform(make_frame(n_rows=5)).shape[1]
+    assert_matches(fitted, compiled, make_frame(n_rows=300, nan_fraction=0.2, seed=1))
+
+
+def test_missing_and_unknown_values(fitted):
+    compiled = CompiledPreprocessor.from_preprocessor(fitted)
+    df = make_frame(n_rows=50, seed=2)
+    df.iloc[:10, 1:] = np.nan
+    df.loc[10:19, 'course'] = 'unseen course'
+    df.loc[20:29, 'gender'] = 'unseen gender'
+    assert_matches(fitted, compiled, df)
+
+
+def test_arrays_round_trip(fitted, tmp_path):
+    compiled = CompiledPreprocessor.from_preprocessor(fitted)
+    file_path = str(tmp_path / 'preprocessor_compiled.npz')
+    compiled.save(file_path)
+    restored = CompiledPreprocessor.load(file_path)
+
+    df = make_frame(n_rows=100, seed=3)
+    np.testing.assert_array_equal(restored.transform(df), compiled.transform(df))
+    assert restored.to_arrays()[0] == compiled.to_arrays()[0]
+
+
+def test_export_rejects_a_deviating_kernel(fitted, tmp_path, monkeypatch):
+    sample = make_frame(n_rows=50, seed=4)
+    file_path = str(tmp_path / 'preprocessor_compiled.npz')
+    export_compiled_preprocessor(fitted, file_path, sample=sample)
+
+    monkeypatch.setattr(CompiledPreprocessor, 'transform',
+                        lambda self, X, dtype=np.float32: np.zeros((len(X), self.n_features_out), dtype=dtype))
+    with pytest.raises(CustomException):
+        export_compiled_preprocessor(fitted, str(tmp_path / 'rejected.npz'), sample=sample)
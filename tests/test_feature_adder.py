@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.exceptions import NotFittedError
+
+from src.components.data_transformation import CustomFeatureAdder
+from src.components.features import FOCUS_FEATURES
+
+COLUMNS = ['id', 'age', 'study_hours', 'class_attendance', 'sleep_hours']
+
+
+def make_frame(n_rows=100, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'id': np.arange(n_rows, dtype=np.float64),
+        'age': rng.integers(17, 25, size=n_rows).astype(np.float64),
+        'study_hours': rng.uniform(0, 8, size=n_rows),
+        'class_attendance': rng.uniform(40, 100, size=n_rows),
+        'sleep_hours': rng.uniform(4, 10, size=n_rows),
+    })
+
+
+def test_ndarray_with_feature_names_matches_dataframe():
+    frame = make_frame()
+    from_frame = CustomFeatureAdder().fit(frame)
+    from_array = CustomFeatureAdder(feature_names=COLUMNS).fit(frame.to_numpy())
+
+    expected_names = [*COLUMNS[1:], *FOCUS_FEATURES]
+    assert list(from_array.get_feature_names_out()) == expected_names
+    assert list(from_frame.get_feature_names_out()) == expected_names
+    np.testing.assert_array_equal(np.asarray(from_array.transform(frame.to_numpy())),
+                                  np.asarray(from_frame.transform(frame)))
+
+
+def test_ndarray_without_feature_names():
+    data = make_frame().to_numpy()
+    with pytest.raises(ValueError, match='feature_names'):
+        CustomFeatureAdder().fit(data)
+
+    adder = CustomFeatureAdder(add_focus_index=False).fit(data)
+    assert list(adder.get_feature_names_out()) == [f"x{i}" for i in range(len(COLUMNS))]
+    with pytest.raises(ValueError, match='3 names for 5 columns'):
+        CustomFeatureAdder(feature_names=COLUMNS[:3]).fit(data)
+
+
+def test_unfitted_adder():
+    adder = CustomFeatureAdder()
+    assert list(adder.get_feature_names_out(COLUMNS)) == [*COLUMNS[1:], *FOCUS_FEATURES]
+    with pytest.raises(NotFittedError):
+        adder.get_feature_names_out()
+    with pytest.raises(NotFittedError):
+        adder.transform(make_frame())
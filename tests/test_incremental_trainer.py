@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+from sklearn.ensemble import HistGradientBoostingRegressor
+from sklearn.ensemble._hist_gradient_boosting.gradient_boosting import BaseHistGradientBoosting
+from sklearn.metrics import r2_score
+
+from src.components.incremental_trainer import continue_boosting
+
+
+def make_data(n_rows=2000, seed=0):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(n_rows, 4))
+    y = 2 * X[:, 0] + np.sin(3 * X[:, 1]) + rng.normal(scale=0.1, size=n_rows)
+    X[rng.random(X.shape) < 0.05] = np.nan
+    return X, y
+
+
+@pytest.fixture
+def fitted():
+    X, y = make_data()
+    return HistGradientBoostingRegressor(max_iter=30, random_state=0).fit(X, y)
+
+
+def test_hist_gradient_boosting_continues_on_the_original_bins(fitted):
+    X, y = make_data(seed=1)
+    # A freshly fitted bin mapper would pick other edges for these rows.
+    updated = continue_boosting(fitted, X, y, n_estimators=10)
+
+    assert updated.n_iter_ == fitted.n_iter_ + 10
+    assert updated._bin_mapper is not fitted._bin_mapper
+    np.testing.assert_array_equal(updated._bin_mapper.bin_thresholds_[0], fitted._bin_mapper.bin_thresholds_[0])
+    assert '_bin_data' not in vars(updated)
+    assert fitted.n_iter_ == 30 and not fitted.warm_start
+
+    X_eval, y_eval = make_data(n_rows=500, seed=2)
+    assert r2_score(y_eval, updated.predict(X_eval)) > 0.9
+
+
+def test_hist_gradient_boosting_guard_runs_before_patching(fitted):
+    del fitted._bin_mapper
+    with pytest.raises(RuntimeError, match='_bin_mapper'):
+        continue_boosting(fitted, *make_data(n_rows=200), n_estimators=5)
+
+
+def test_hist_gradient_boosting_guard_checks_the_bin_data_hook(fitted, monkeypatch):
+    X, y = make_data(n_rows=200)
+
+    monkeypatch.setattr(BaseHistGradientBoosting, '_bin_data', lambda self, X, is_training_data, n_threads: X)
+    with pytest.raises(RuntimeError, match='_bin_data'):
+        continue_boosting(fitted, X, y, n_estimators=5)
+
+    monkeypatch.delattr(BaseHistGradientBoosting, '_bin_data')
+    with pytest.raises(RuntimeError, match='_bin_data'):
+        continue_boosting(fitted, X, y, n_estimators=5)
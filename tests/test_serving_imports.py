@@ -0,0 +1,26 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Training libraries a serving worker must not pay for at import time.
+HEAVY_MODULES = ('pandas', 'sklearn', 'scipy', 'pyarrow', 'xgboost', 'catboost')
+
+PROBE = '''
+import importlib
+import sys
+
+importlib.import_module(sys.argv[1])
+print(' '.join(name for name in sys.argv[2:] if name in sys.modules))
+'''
+
+
+@pytest.mark.parametrize('module', ['app', 'asgi', 'pipeline.predict_pipeline'])
+def test_serving_import_stays_light(module, tmp_path):
+    env = {**os.environ, 'PYTHONPATH': os.pathsep.join(filter(None, [REPO_ROOT, os.environ.get('PYTHONPATH')]))}
+    output = subprocess.run([sys.executable, '-c', PROBE, module, *HEAVY_MODULES], cwd=tmp_path, env=env,
+                            check=True, capture_output=True, text=True).stdout
+    assert output.split() == [], f"importing {module} loads {output.strip()}"
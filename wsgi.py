@@ -0,0 +1,25 @@
+'''
+Production WSGI entry point. With gunicorn's preload_app (gunicorn.conf.py)
+this module runs once in the master: the heavy libraries are imported and the
+artifacts loaded before workers are forked, so workers start without
+importing anything and share those pages copy-on-write. No prediction runs
+here: OpenMP thread pools started before fork() can hang the workers, so
+each worker warms itself up in post_fork (gunicorn.conf.py).
+'''
+import gc
+import logging
+
+from app import app
+from pipeline.predict_pipeline import preload
+
+try:
+    preload()
+except Exception as e:
+    # Fresh deploy without artifacts: workers load them on the first request.
+    logging.error(f"Loading the serving artifacts in the master process failed: {e}")
+
+# Everything alive now lives as long as the server. Moving it out of the
+# collector's generations stops gc from writing to, and so un-sharing, its pages.
+gc.freeze()
+
+application = app